@@ -1,6 +1,8 @@
+import operator
+import sys
 from abc import ABC, abstractmethod
-from itertools import chain, islice, pairwise
-from typing import Optional, List, Dict, LiteralString, Union, Iterator, Callable
+from itertools import chain, islice
+from typing import Optional, List, Dict, LiteralString, Union, Iterable, Iterator, Callable, Tuple, Set
 
 from src.exceptions import (
     DIRuntimeSyntaxError, DITypeError, DIZeroDivisionError,
@@ -12,14 +14,67 @@ from src.typing import (
 )
 
 
+_BINARY_OPERATIONS: Dict[str, Callable[[TResult, TResult], TResult]] = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '//': operator.floordiv,
+    '%': operator.mod,
+    '@': operator.matmul,
+    '<<': operator.lshift,
+    '>>': operator.rshift,
+}
+
+_COMPARISONS: Dict[str, Callable[[TResult, TResult], bool]] = {
+    '<=': operator.le,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '>': operator.gt,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+
 class ASTRoot(ABC):
+    # trees have many nodes, so most classes declare their attributes in slots.
+    # Classes binding evaluate per instance keep a __dict__, as a slot can't shadow a method
+    __slots__ = ('line', 'pos')
+
+    # names of the attributes holding child nodes (or lists of them)
+    _fields: Tuple[str, ...] = ()
+    is_literal: bool = False
+
+    _NODE_TYPE: str = "ASTRoot"
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        cls._NODE_TYPE = cls.__name__.replace("Node", "")
 
     def __init__(self, line: int, pos: int) -> None:
         self.line = line
         self.pos = pos
 
     def __repr__(self) -> str:
-        return type(self).__name__.replace("Node", "")
+        return self._NODE_TYPE
+
+    def children(self) -> Iterator["ASTRoot"]:
+        def flatten(value):
+            if isinstance(value, ASTRoot):
+                yield value
+            elif isinstance(value, list):
+                for item in value:
+                    yield from flatten(item)
+
+        for field in self._fields:
+            yield from flatten(getattr(self, field))
+
+    def finalize(self) -> None:
+        """
+        Precompute whatever evaluation needs from the children.
+        Must be called again after the children are replaced
+        """
+        pass
 
     @abstractmethod
     def evaluate(self, environment: Dict) -> TResult:
@@ -30,37 +85,74 @@ class ASTRoot(ABC):
         pass
 
 
+def truncate_environment(environment: Dict, size: int) -> None:
+    """
+    Delete the names created after the environment had the given size.
+    Dicts keep insertion order, so these are the last ones
+    """
+    if len(environment) > size:
+        redundant_variables = list(islice(reversed(environment), len(environment) - size))
+        for variable_to_delete in redundant_variables:
+            del environment[variable_to_delete]
+
+
 class ScopeNode(ASTRoot):
+    _fields = ('instructions',)
+
     def __init__(self, line: int, pos: int) -> None:
         super().__init__(line, pos)
         self.instructions = []
+        self._thunks: List[Callable[[Dict], TResult]] = []
+
+    def finalize(self) -> None:
+        self._thunks = [instruction.evaluate for instruction in self.instructions]
+        # e.g. bodies of branches and loops without braces
+        if len(self._thunks) == 1:
+            self._single = self._thunks[0]
+            self.evaluate = self.evaluate_single
+        else:
+            self.evaluate = self.evaluate_sequence
 
-    def evaluate(self, environment: Dict, flush_variables: bool = True) -> TResult:
-        old_environment = set(environment.keys())
+    def evaluate_single(self, environment: Dict, flush_variables: bool = True) -> TResult:
+        old_size = len(environment)
+        try:
+            return self._single(environment)
+        finally:
+            if flush_variables:
+                truncate_environment(environment, old_size)
 
-        last = None
-        for instruction in self.instructions:
-            last = instruction.evaluate(environment)
+    def evaluate_sequence(self, environment: Dict, flush_variables: bool = True) -> TResult:
+        old_size = len(environment)
 
-        if flush_variables:
-            redundant_variables = set(environment.keys())
-            redundant_variables.difference_update(old_environment)
-            for variable_to_delete in redundant_variables:
-                environment.pop(variable_to_delete, None)
+        last = None
+        try:
+            for evaluate in self._thunks:
+                last = evaluate(environment)
+        finally:
+            if flush_variables:
+                truncate_environment(environment, old_size)
 
         return last
 
+    def evaluate(self, environment: Dict, flush_variables: bool = True) -> TResult:
+        # shadowed by the handler bound in finalize
+        return self.evaluate_sequence(environment, flush_variables)
+
     def serialize(self, stdout) -> None:
         # TODO: serialization
         pass
 
 
 class IfElseNode(ASTRoot):
+    _fields = ('conditions', 'branch_scopes', 'else_scope')
+
     def __init__(self, line: int, pos: int) -> None:
         super().__init__(line, pos)
         self.conditions: List[ASTRoot] = []
         self.branch_scopes: List[ScopeNode] = []
         self.else_scope: Optional[ScopeNode] = None
+        self._pairs: List[Tuple[Callable[[Dict], TResult], Callable[[Dict], TResult]]] = []
+        self._else: Optional[Callable[[Dict], TResult]] = None
 
     def add_branch(self, condition: Optional[ASTRoot], scope: ScopeNode) -> None:
         if condition is None:
@@ -69,27 +161,110 @@ class IfElseNode(ASTRoot):
             self.conditions.append(condition)
             self.branch_scopes.append(scope)
 
-    def evaluate(self, environment: Dict) -> TResult:
+    def finalize(self) -> None:
+        self._pairs = [(condition.evaluate, scope.evaluate) for condition, scope in zip(self.conditions, self.branch_scopes)]
+        self._else = self.else_scope.evaluate if self.else_scope is not None else None
+        # if without elif is by far the most common, so it doesn't need the loop
+        if len(self._pairs) == 1:
+            self._condition, self._then = self._pairs[0]
+            self.evaluate = self.evaluate_single
+        elif self.build_switch_table():
+            self.evaluate = self.evaluate_switch
+        else:
+            self.evaluate = self.evaluate_chain
+
+    def build_switch_table(self) -> bool:
+        """
+        If every condition compares the same variable to a literal with ==,
+        map the literals to their branches, so that the branch is found with one lookup
+        """
+        table = {}
+        subject = None
         for condition, scope in zip(self.conditions, self.branch_scopes):
-            if condition.evaluate(environment):
-                return scope.evaluate(environment)
-        if self.else_scope is not None:
-            return self.else_scope.evaluate(environment)
+            if not isinstance(condition, EqualNode):
+                return False
+            lhs, rhs = condition.operands
+            if not isinstance(lhs, IdentifierNode) or not rhs.is_literal:
+                return False
+            if subject is not None and lhs.name != subject.name:
+                return False
+            subject = lhs
 
+            value = rhs.evaluate({})
+            # nan is not equal to itself, but would be found in the table
+            if value != value:
+                return False
+            # the first branch wins over the later ones with an equal literal
+            table.setdefault(value, scope.evaluate)
+
+        self._subject = subject.evaluate
+        self._table = table
+        return True
+
+    def evaluate_single(self, environment: Dict) -> TResult:
+        if self._condition(environment):
+            return self._then(environment)
+        if self._else is not None:
+            return self._else(environment)
+        return None
+
+    def evaluate_switch(self, environment: Dict) -> TResult:
+        try:
+            branch = self._table.get(self._subject(environment))
+        except TypeError:
+            # lists and instances aren't hashable, and never equal to a literal either
+            branch = None
+        if branch is not None:
+            return branch(environment)
+        if self._else is not None:
+            return self._else(environment)
         return None
 
+    def evaluate_chain(self, environment: Dict) -> TResult:
+        for condition, branch in self._pairs:
+            if condition(environment):
+                return branch(environment)
+        if self._else is not None:
+            return self._else(environment)
+
+        return None
+
+    def evaluate(self, environment: Dict) -> TResult:
+        # shadowed by the handler bound in finalize
+        return self.evaluate_chain(environment)
+
     def serialize(self, stdout) -> None:
         # TODO: serialization
         pass
 
 
 class WhileNode(ASTRoot):
+    __slots__ = ('condition', 'scope', '_invariant_frames')
+    _fields = ('condition', 'scope')
+
     def __init__(self, line: int, pos: int, condition: ASTRoot, scope: ScopeNode) -> None:
         super().__init__(line, pos)
         self.condition = condition
         self.scope = scope
+        # one cache per running loop, see InvariantNode
+        self._invariant_frames: Optional[List[Dict]] = None
+
+    def cache_invariant(self, expression: ASTRoot, names: Iterable[str]) -> "InvariantNode":
+        if self._invariant_frames is None:
+            self._invariant_frames = []
+        return InvariantNode(expression.line, expression.pos, expression, names, self._invariant_frames)
 
     def evaluate(self, environment: Dict) -> TResult:
+        if self._invariant_frames is None:
+            return self.evaluate_loop(environment)
+
+        self._invariant_frames.append({})
+        try:
+            return self.evaluate_loop(environment)
+        finally:
+            self._invariant_frames.pop()
+
+    def evaluate_loop(self, environment: Dict) -> TResult:
         result = None
         while self.condition.evaluate(environment):
             result = self.scope.evaluate(environment)
@@ -100,11 +275,150 @@ class WhileNode(ASTRoot):
         pass
 
 
+class RangeLoopNode(WhileNode):
+    """
+    Counted loop, e.g. while (i < n) { ...; i := i + 1 } or while (i >= 0) { ...; i := i - 2 },
+    where only the last instruction changes the counter, the bound doesn't change inside the loop
+    and the counter moves towards it by a literal step.
+    Integer bounds are iterated with range, anything else goes through the general loop
+    """
+    __slots__ = ('_counter', '_stop', '_stop_names', '_inclusive', '_step', '_body')
+
+    def __init__(self, line: int, pos: int, condition: "SingleComparisonNode", scope: ScopeNode) -> None:
+        super().__init__(line, pos, condition, scope)
+        self.finalize()
+
+    def finalize(self) -> None:
+        counter, stop = self.condition.operands
+        increment = self.scope.instructions[-1]
+        self._counter = counter.name
+        self._stop = stop.evaluate
+        self._stop_names = tuple(referenced_names(stop))
+        self._inclusive = isinstance(self.condition, (LessEqualNode, GreaterEqualNode))
+        step = increment.chain_of_assignments[1]
+        self._step = step.operands[1].number if step.operators == ['+'] else -step.operands[1].number
+        # the body without the increment
+        self._body = ScopeNode(self.scope.line, self.scope.pos)
+        self._body.instructions = self.scope.instructions[:-1]
+        self._body.finalize()
+
+    def evaluate_loop(self, environment: Dict) -> TResult:
+        start = environment.get(self._counter)
+        if type(start) is not int:
+            return super().evaluate_loop(environment)
+        stop = self._stop(environment)
+        if type(stop) is not int:
+            return super().evaluate_loop(environment)
+        # a bound computed from lists or objects may change in place, e.g. through another name
+        if not all(isinstance(environment.get(name), InvariantNode._CACHEABLE_TYPES) for name in self._stop_names):
+            return super().evaluate_loop(environment)
+
+        if self._inclusive:
+            stop += 1 if self._step > 0 else -1
+        body = self._body.evaluate
+        counter = self._counter
+        step = self._step
+
+        result = None
+        for value in range(start, stop, step):
+            body(environment)
+            environment[counter] = result = value + step
+        return result
+
+
+class InvariantNode(ASTRoot):
+    """
+    Expression which reads nothing reassigned inside the enclosing loop.
+    It's evaluated once per run of the loop, unless its value is mutable
+    or some of the names it reads hold lists or objects, which may be changed in place,
+    e.g. through another name or by a call
+    """
+    __slots__ = ('expression', '_names', '_frames')
+    _fields = ('expression',)
+
+    _UNCACHEABLE = object()
+    _CACHEABLE_TYPES = (type(None), bool, int, float, complex, str)
+
+    def __init__(self, line: int, pos: int, expression: ASTRoot, names: Iterable[str], frames: List[Dict]) -> None:
+        super().__init__(line, pos)
+        self.expression = expression
+        self._names = tuple(names)
+        self._frames = frames
+
+    def evaluate(self, environment: Dict) -> TResult:
+        cache = self._frames[-1]
+        value = cache.get(self, self._UNCACHEABLE)
+        if value is not self._UNCACHEABLE:
+            return value
+
+        value = self.expression.evaluate(environment)
+        if self not in cache:
+            if isinstance(value, self._CACHEABLE_TYPES) and self._reads_immutable(environment):
+                cache[self] = value
+            else:
+                cache[self] = self._UNCACHEABLE
+        return value
+
+    def _reads_immutable(self, environment: Dict) -> bool:
+        # functions can't be changed, but names missing here might be read elsewhere
+        for name in self._names:
+            value = environment.get(name, self._UNCACHEABLE)
+            if not isinstance(value, self._CACHEABLE_TYPES) and not callable(value):
+                return False
+        return True
+
+    def serialize(self, stdout) -> None:
+        # TODO: serialization
+        pass
+
+
+class LazyConstantNode(ASTRoot):
+    """
+    Expression of literals only, too expensive to fold before running the program, e.g. 2 ** 1000.
+    It's computed when first evaluated, later evaluations reuse the value.
+    Errors aren't remembered, so they're raised again every time
+    """
+    __slots__ = ('expression', '_value')
+    _fields = ('expression',)
+
+    _NOT_COMPUTED = object()
+
+    def __init__(self, line: int, pos: int, expression: ASTRoot) -> None:
+        super().__init__(line, pos)
+        self.expression = expression
+        self._value = self._NOT_COMPUTED
+
+    def finalize(self) -> None:
+        self._value = self._NOT_COMPUTED
+
+    def evaluate(self, environment: Dict) -> TResult:
+        value = self._value
+        if value is self._NOT_COMPUTED:
+            value = self._value = self.expression.evaluate(environment)
+        return value
+
+    def serialize(self, stdout) -> None:
+        # TODO: serialization
+        pass
+
+
 class AssignmentNode(ASTRoot):
+    __slots__ = ('chain_of_assignments', 'chain_of_orders', '_value', '_steps')
+    _fields = ('chain_of_assignments',)
+
     def __init__(self, line: int, pos: int, operands: List[ASTRoot], orders: List[bool]) -> None:
         super().__init__(line, pos)
         self.chain_of_assignments: List[ASTRoot] = operands or []
         self.chain_of_orders = orders or []
+        self.finalize()
+
+    def finalize(self) -> None:
+        # targets are assigned right to left, each one with its handler resolved in advance
+        self._value = self.chain_of_assignments[-1]
+        self._steps = [
+            (self.resolve_assignment(target), target, return_old)
+            for target, return_old in zip(self.chain_of_assignments[-2::-1], self.chain_of_orders[::-1])
+        ]
 
     @staticmethod
     def evaluate_if_not(value: Union[ASTRoot, TResult], environment: Dict) -> TResult:
@@ -119,15 +433,29 @@ class AssignmentNode(ASTRoot):
             return_old: bool,
             environment: Dict
     ) -> TResult:
+        assign = AssignmentNode.resolve_assignment(lhs)
+        return assign(lhs, rhs, return_old, environment)
+
+    @staticmethod
+    def resolve_assignment(lhs: ASTRoot) -> Callable[[ASTRoot, Union[ASTRoot, TResult], bool, Dict], TResult]:
         if isinstance(lhs, IdentifierNode):
-            return AssignmentNode.assign_identifier(lhs, rhs, return_old, environment)
+            return AssignmentNode.assign_identifier
         if isinstance(lhs, OperatorNode):
             if lhs.operator == '$index':
-                return AssignmentNode.assign_indexation(lhs, rhs, return_old, environment)
+                return AssignmentNode.assign_indexation
             if lhs.operator == "$attr":
-                return AssignmentNode.assign_member(lhs, rhs, return_old, environment)
+                return AssignmentNode.assign_member
         if isinstance(lhs, ListNode):
-            return AssignmentNode.assign_list(lhs, rhs, return_old, environment)
+            return AssignmentNode.assign_list
+        return AssignmentNode.assign_invalid
+
+    @staticmethod
+    def assign_invalid(
+            lhs: ASTRoot,
+            rhs: Union[ASTRoot, TResult],
+            return_old: bool,
+            environment: Dict
+    ) -> TResult:
         raise ValueError(f"cannot assign to expression here: {lhs}")
 
     @staticmethod
@@ -160,48 +488,42 @@ class AssignmentNode(ASTRoot):
                 lhs.line, lhs.pos,
                 f"cannot unpack non-iterable {type(rhs)} object")
 
-        ellipses_count = 0
-        ellipsis_element = None
-        slice_of_rhs = None
-
-        for idx, x in enumerate(lhs):
-            if not isinstance(x, EllipsisOperatorNode):
-                continue
-            ellipses_count += 1
-            if ellipses_count > 1:
-                raise DIRuntimeSyntaxError(
-                    lhs.line, lhs.pos,
-                    f"too many unpacking expressions in assignment")
-            ellipsis_element = x.elements
-            if not isinstance(ellipsis_element, IdentifierNode):
-                pass
-            slice_of_rhs = slice(idx, idx + len(rhs_value) - len(lhs) + 1)
+        ellipsis_indices = lhs._ellipsis_indices
+        if len(ellipsis_indices) > 1:
+            raise DIRuntimeSyntaxError(
+                lhs.line, lhs.pos,
+                f"too many unpacking expressions in assignment")
+
+        lhs_length = len(lhs.elements)
+        rhs_length = len(rhs_value)
 
-        if (len(lhs) > len(rhs_value) and not ellipses_count) or len(lhs) > len(rhs_value) + 1:
+        if (lhs_length > rhs_length and not ellipsis_indices) or lhs_length > rhs_length + 1:
             raise DIRuntimeSyntaxError(
                 lhs.line, lhs.pos,
-                f"not enough values to unpack (expected {len(lhs)}, got {len(rhs_value)})")
+                f"not enough values to unpack (expected {lhs_length}, got {rhs_length})")
 
-        if len(lhs) < len(rhs_value) and not ellipses_count:
+        if lhs_length < rhs_length and not ellipsis_indices:
             raise DIRuntimeSyntaxError(
                 lhs.line, lhs.pos,
-                f"too many values to unpack (expected {len(lhs)}, got {len(rhs_value)})")
+                f"too many values to unpack (expected {lhs_length}, got {rhs_length})")
 
         lhs_old_value = None
         if return_old:
             lhs_old_value = lhs.evaluate(environment)
 
-        if ellipses_count:
-            mono_lhs = chain(islice(lhs, 0, slice_of_rhs.start), islice(lhs, slice_of_rhs.start + 1, None))
-            mono_rhs = chain(islice(rhs_value, 0, slice_of_rhs.start), islice(rhs_value, slice_of_rhs.stop, None))
+        if ellipsis_indices:
+            start = ellipsis_indices[0]
+            stop = start + rhs_length - lhs_length + 1
+            mono_lhs = chain(islice(lhs.elements, 0, start), islice(lhs.elements, start + 1, None))
+            mono_rhs = chain(islice(rhs_value, 0, start), islice(rhs_value, stop, None))
 
-            rhs_slice = rhs_value[slice_of_rhs]
-            AssignmentNode.perform_assignment(ellipsis_element, rhs_slice, return_old, environment)
+            ellipsis_element = lhs.elements[start].elements
+            AssignmentNode.perform_assignment(ellipsis_element, rhs_value[start:stop], return_old, environment)
 
             for i, v in zip(mono_lhs, mono_rhs, strict=True):
                 AssignmentNode.perform_assignment(i, v, return_old, environment)
         else:
-            for i, v in zip(lhs, rhs_value, strict=True):
+            for i, v in zip(lhs.elements, rhs_value, strict=True):
                 AssignmentNode.perform_assignment(i, v, return_old, environment)
         if return_old:
             return lhs_old_value
@@ -214,19 +536,20 @@ class AssignmentNode(ASTRoot):
             return_old: bool,
             environment: Dict
     ) -> TResult:
-        primary, *intermediate, last = lhs.operands
-        value = primary.evaluate(environment)
+        *intermediate, last = lhs._flat_indexers
+        value = lhs._primary(environment)
 
-        for i in intermediate:
-            value = value[i.evaluate(environment)]
+        for index in intermediate:
+            value = value[index(environment)]
 
         new_value = AssignmentNode.evaluate_if_not(rhs, environment)
+        key = last(environment)
         if return_old:
-            old_value = value[last.evaluate(environment)]
-            value[last.evaluate(environment)] = new_value
+            old_value = value[key]
+            value[key] = new_value
             return old_value
         else:
-            value[last.evaluate(environment)] = new_value
+            value[key] = new_value
             return new_value
 
     @staticmethod
@@ -252,14 +575,18 @@ class AssignmentNode(ASTRoot):
             return new_value
 
     def evaluate(self, environment: Dict) -> TResult:
-        rhs = self.chain_of_assignments[-1]
         try:
-            for identifier, return_old in zip(reversed(self.chain_of_assignments[:-1]), reversed(self.chain_of_orders)):
-                rhs = self.perform_assignment(identifier, rhs, return_old, environment)
+            return self._assign(environment)
         except ValueError as e:
             raise DIRuntimeSyntaxError(self.line, self.pos, str(e))
         except IndexError as e:
             raise DIIndexError(self.line, self.pos, str(e))
+
+    def _assign(self, environment: Dict) -> TResult:
+        # errors are translated by evaluate, so the specialized subclasses only override this
+        rhs = self._value
+        for assign, target, return_old in self._steps:
+            rhs = assign(target, rhs, return_old, environment)
         return rhs
 
     def serialize(self, stdout) -> None:
@@ -267,7 +594,93 @@ class AssignmentNode(ASTRoot):
         pass
 
 
+class IdentifierAssignmentNode(AssignmentNode):
+    """
+    Assignment to a single variable, e.g. x := expression
+    """
+    __slots__ = ('_name',)
+
+    def finalize(self) -> None:
+        target, value = self.chain_of_assignments
+        self._name = target.name
+        self._value = value.evaluate
+
+    def _assign(self, environment: Dict) -> TResult:
+        environment[self._name] = new_value = self._value(environment)
+        return new_value
+
+
+class IndexAssignmentNode(AssignmentNode):
+    """
+    Assignment to a single list element, e.g. a[i][j] := expression
+    """
+    __slots__ = ('_container', '_intermediate', '_key')
+
+    def finalize(self) -> None:
+        target, value = self.chain_of_assignments
+        *intermediate, last = target._flat_indexers
+        self._container = target._primary
+        self._intermediate = intermediate
+        self._key = last
+        self._value = value.evaluate
+
+    def _assign(self, environment: Dict) -> TResult:
+        container = self._container(environment)
+        for index in self._intermediate:
+            container = container[index(environment)]
+        new_value = self._value(environment)
+        container[self._key(environment)] = new_value
+        return new_value
+
+
+class MemberAssignmentNode(AssignmentNode):
+    """
+    Assignment to a single member, e.g. object.member := expression
+    """
+    __slots__ = ('_container', '_intermediate', '_member')
+
+    def finalize(self) -> None:
+        target, value = self.chain_of_assignments
+        *intermediate, last = target._attr_names
+        self._container = target._primary
+        self._intermediate = intermediate
+        self._member = last
+        self._value = value.evaluate
+
+    def _assign(self, environment: Dict) -> TResult:
+        container = self._container(environment)
+        for name in self._intermediate:
+            container = container[name]
+        container[self._member] = new_value = self._value(environment)
+        return new_value
+
+
+class UnpackAssignmentNode(AssignmentNode):
+    """
+    Unpacking into variables only, e.g. [a, b] := [b, a].
+    The whole right side is evaluated before any variable is assigned
+    """
+    __slots__ = ('_target', '_names')
+
+    def finalize(self) -> None:
+        target, value = self.chain_of_assignments
+        self._target = target
+        self._names = tuple(element.name for element in target.elements)
+        self._value = value.evaluate
+
+    def _assign(self, environment: Dict) -> TResult:
+        new_value = self._value(environment)
+        if type(new_value) is not ListWrapper or len(new_value) != len(self._names):
+            # let the general path report errors and unpack strings
+            return self.assign_list(self._target, new_value, False, environment)
+        for name, element in zip(self._names, new_value.content):
+            environment[name] = element
+        return new_value
+
+
 class OperatorNode(ASTRoot):
+    _fields = ('operands',)
+
     def __init__(self, line: int, pos: int, operator: LiteralString, operands: List[Union[ASTRoot]]) -> None:
         super().__init__(line, pos)
         self.operator: LiteralString = operator
@@ -276,93 +689,130 @@ class OperatorNode(ASTRoot):
         $ index: list of lists of ...
         $ attr: list of Identifier Nodes
         """
+        # operator is fixed at parse time, so resolve the handler once
+        self.evaluate = self._DISPATCH[operator].__get__(self, OperatorNode)
+        self.finalize()
+
+    def finalize(self) -> None:
+        if self.operator == '$index':
+            primary, *indexers = self.operands
+            self._primary = primary.evaluate
+            self._flat_indexers = [index.evaluate for index in chain.from_iterable(indexers)]
+            # e.g. a[i], which needs no loop
+            if len(self._flat_indexers) == 1:
+                self._index = self._flat_indexers[0]
+                self.evaluate = self.evaluate_single_index
+            else:
+                self.evaluate = self.evaluate_indexation
+        elif self.operator == '$attr':
+            primary, *members = self.operands
+            self._primary = primary.evaluate
+            self._attr_names = tuple(member.name for member in members)
+        elif self.operator == '$func':
+            primary, *calls = self.operands
+            self._primary = primary.evaluate
+            self._arguments = [[argument.evaluate for argument in arguments] for arguments in calls]
+        else:
+            # sliced once here rather than on every evaluation
+            thunks = [operand.evaluate for operand in self.operands]
+            self._first, *self._rest = thunks
+            *self._init, self._last = thunks
+            self._init_reversed = self._init[::-1]
 
     def evaluate_or(self, environment: Dict) -> TResult:
-        for operand in self.operands[:-1]:
-            result = operand.evaluate(environment)
+        for operand in self._init:
+            result = operand(environment)
             if result:
                 return result
-        return self.operands[-1].evaluate(environment)
+        return self._last(environment)
 
     def evaluate_and(self, environment: Dict) -> TResult:
-        for operand in self.operands:
-            result = operand.evaluate(environment)
+        for operand in self._init:
+            result = operand(environment)
             if not result:
                 return result
-        return self.operands[-1].evaluate(environment)
+        return self._last(environment)
+
+    def evaluate_coalesce(self, environment: Dict) -> TResult:
+        for operand in self._init:
+            result = operand(environment)
+            if result is not None:
+                return result
+        return self._last(environment)
 
     def evaluate_power(self, environment: Dict) -> TResult:
-        value = self.operands[-1].evaluate(environment)
-        for operand in reversed(self.operands[:-1]):
-            value = operand.evaluate(environment) ** value
+        value = self._last(environment)
+        for operand in self._init_reversed:
+            value = operand(environment) ** value
         return value
 
     def evaluate_bitwise_xor(self, environment: Dict) -> TResult:
-        value = self.operands[0].evaluate(environment)
-        for operand in self.operands[1:]:
-            value = value ^ operand.evaluate(environment)
+        value = self._first(environment)
+        for operand in self._rest:
+            value = value ^ operand(environment)
         return value
 
     def evaluate_bitwise_and(self, environment: Dict) -> TResult:
-        value = self.operands[0].evaluate(environment)
-        for operand in self.operands[1:]:
-            value = value & operand.evaluate(environment)
+        value = self._first(environment)
+        for operand in self._rest:
+            value = value & operand(environment)
         return value
 
     def evaluate_bitwise_or(self, environment: Dict) -> TResult:
-        value = self.operands[0].evaluate(environment)
-        for operand in self.operands[1:]:
-            value = value | operand.evaluate(environment)
+        value = self._first(environment)
+        for operand in self._rest:
+            value = value | operand(environment)
         return value
 
     def evaluate_func_call(self, environment: Dict) -> TResult:
-        value = self.operands[0].evaluate(environment)
-        for operand in self.operands[1:]:
+        value = self._primary(environment)
+        for arguments in self._arguments:
             if not callable(value):
                 raise DITypeError(self.line, self.pos, f'Not a function: {value}')
-            value = value([o.evaluate(environment) for o in operand])
+            value = value([argument(environment) for argument in arguments])
         return value
 
     def evaluate_indexation(self, environment: Dict) -> TResult:
-        primary, *indexers = self.operands
-        value = primary.evaluate(environment)
+        value = self._primary(environment)
         try:
-            for index in chain.from_iterable(indexers):
-                value = value[index.evaluate(environment)]
+            for index in self._flat_indexers:
+                value = value[index(environment)]
         except IndexError as e:
             raise DIIndexError(self.line, self.pos, str(e))
         return value
 
+    def evaluate_single_index(self, environment: Dict) -> TResult:
+        value = self._primary(environment)
+        try:
+            return value[self._index(environment)]
+        except IndexError as e:
+            raise DIIndexError(self.line, self.pos, str(e))
+
     def evaluate_member_access(self, environment: Dict) -> TResult:
-        primary, *indexers = self.operands
-        value = primary.evaluate(environment)
+        value = self._primary(environment)
         try:
-            for indexer in indexers:
-                value = value[indexer.name]
+            for name in self._attr_names:
+                value = value[name]
         except IndexError as e:
             raise DIIndexError(self.line, self.pos, str(e))
         return value
 
+    _DISPATCH: Dict[str, Callable[["OperatorNode", Dict], TResult]] = {
+        'or': evaluate_or,
+        'and': evaluate_and,
+        '?': evaluate_coalesce,
+        '**': evaluate_power,
+        '^': evaluate_bitwise_xor,
+        '&': evaluate_bitwise_and,
+        '|': evaluate_bitwise_or,
+        '$func': evaluate_func_call,
+        '$index': evaluate_indexation,
+        '$attr': evaluate_member_access,
+    }
+
     def evaluate(self, environment: Dict) -> TResult:
-        match self.operator:
-            case 'or':
-                return self.evaluate_or(environment)
-            case 'and':
-                return self.evaluate_and(environment)
-            case '**':
-                return self.evaluate_power(environment)
-            case '^':
-                return self.evaluate_bitwise_xor(environment)
-            case '&':
-                return self.evaluate_bitwise_and(environment)
-            case '|':
-                return self.evaluate_bitwise_or(environment)
-            case '$func':
-                return self.evaluate_func_call(environment)
-            case '$index':
-                return self.evaluate_indexation(environment)
-            case '$attr':
-                return self.evaluate_member_access(environment)
+        # shadowed by the handler bound in __init__
+        return self._DISPATCH[self.operator](self, environment)
 
     def serialize(self, stdout) -> None:
         # TODO: serialization
@@ -370,35 +820,28 @@ class OperatorNode(ASTRoot):
 
 
 class ComparisonNode(ASTRoot):
+    __slots__ = ('operators', 'operands', '_comparisons', '_first', '_steps')
+    _fields = ('operands',)
+
     def __init__(self, line: int, pos: int, operators: List[str], operands: List[ASTRoot]) -> None:
         super().__init__(line, pos)
         self.operators = operators
         self.operands = operands
+        self._comparisons = [_COMPARISONS[op] for op in operators]
+        self.finalize()
 
-    # TODO: wrapper
-    def evaluate(self, environment: Dict) -> bool:
-
-        result = True
-        for op, (lhs_, rhs_) in zip(self.operators, pairwise(self.operands)):
-
-            lhs = lhs_.evaluate(environment)
-            rhs = rhs_.evaluate(environment)
-
-            if op == '<=':
-                result = lhs <= rhs
-            elif op == '>=':
-                result = lhs >= rhs
-            elif op == '<':
-                result = lhs < rhs
-            elif op == '>':
-                result = lhs > rhs
-            elif op == '==':
-                result = lhs == rhs
-            elif op == '!=':
-                result = lhs != rhs
+    def finalize(self) -> None:
+        self._first = self.operands[0].evaluate
+        self._steps = list(zip(self._comparisons, [operand.evaluate for operand in self.operands[1:]]))
 
-            if not result:
+    def evaluate(self, environment: Dict) -> bool:
+        # every operand is evaluated at most once, e.g. f(x) in a < f(x) < b
+        lhs = self._first(environment)
+        for compare, operand in self._steps:
+            rhs = operand(environment)
+            if not compare(lhs, rhs):
                 return False
+            lhs = rhs
         return True
 
     def serialize(self, stdout) -> None:
@@ -406,104 +849,292 @@ class ComparisonNode(ASTRoot):
         pass
 
 
+class SingleComparisonNode(ComparisonNode):
+    """
+    Comparison of exactly two operands, e.g. a < b, which is much more common
+    than chained comparisons. Subclasses define the operation itself
+    """
+    __slots__ = ('_lhs', '_rhs')
+    _OPERATION: Callable[[TResult, TResult], bool]
+
+    def finalize(self) -> None:
+        lhs, rhs = self.operands
+        self._lhs = lhs.evaluate
+        self._rhs = rhs.evaluate
+
+    def evaluate(self, environment: Dict) -> bool:
+        return self._OPERATION(self._lhs(environment), self._rhs(environment))
+
+
+class LessNode(SingleComparisonNode):
+    __slots__ = ()
+    _OPERATION = staticmethod(operator.lt)
+
+
+class LessEqualNode(SingleComparisonNode):
+    __slots__ = ()
+    _OPERATION = staticmethod(operator.le)
+
+
+class GreaterNode(SingleComparisonNode):
+    __slots__ = ()
+    _OPERATION = staticmethod(operator.gt)
+
+
+class GreaterEqualNode(SingleComparisonNode):
+    __slots__ = ()
+    _OPERATION = staticmethod(operator.ge)
+
+
+class EqualNode(SingleComparisonNode):
+    __slots__ = ()
+    _OPERATION = staticmethod(operator.eq)
+
+
+class NotEqualNode(SingleComparisonNode):
+    __slots__ = ()
+    _OPERATION = staticmethod(operator.ne)
+
+
+SINGLE_COMPARISON_NODES: Dict[str, type[SingleComparisonNode]] = {
+    '<': LessNode,
+    '<=': LessEqualNode,
+    '>': GreaterNode,
+    '>=': GreaterEqualNode,
+    '==': EqualNode,
+    '!=': NotEqualNode,
+}
+
+
 class LeftPolyOperatorNode(ASTRoot):
+    _fields = ('operands',)
+
     def __init__(self, line: int, pos: int, operators: List[str], operands: List[ASTRoot]) -> None:
         super().__init__(line, pos)
         self.operators = operators
         self.operands = operands
+        self.finalize()
 
-    def evaluate(self, environment: Dict) -> TResult:
-
-        lhs = self.operands[0].evaluate(environment)
-        iterator = zip(self.operators, self.operands[1:])
-
-        for op, next_value in iterator:
-            rhs = next_value.evaluate(environment)
+    def _resolve_operation(self, op: str, rhs_node: ASTRoot) -> Callable[[TResult, TResult], TResult]:
+        operation = _BINARY_OPERATIONS.get(op)
+        if operation is None:
+            return lambda lhs, rhs: None
 
-            if op == '+':
-                value = lhs + rhs
-            elif op == '-':
-                value = lhs - rhs
-            elif op == '*':
-                value = lhs * rhs
-            elif op == '/':
-                try:
-                    value = lhs / rhs
-                except ZeroDivisionError:
-                    raise DIZeroDivisionError(self.line, self.pos, f"cannot divide: {lhs} / {rhs}. Rhs is {next_value}")
-            elif op == '//':
-                try:
-                    value = lhs // rhs
-                except ZeroDivisionError:
-                    raise DIZeroDivisionError(self.line, self.pos, f"cannot divide: {lhs} // {rhs}")
-            elif op == '%':
+        # a nonzero literal divisor can't raise ZeroDivisionError
+        if op in ('/', '//', '%') and not (isinstance(rhs_node, NumberNode) and rhs_node.number != 0):
+            def checked_division(lhs: TResult, rhs: TResult) -> TResult:
                 try:
-                    value = lhs % rhs
+                    return operation(lhs, rhs)
                 except ZeroDivisionError:
-                    raise DIZeroDivisionError(self.line, self.pos, f"cannot divide: {lhs} % {rhs}")
-            elif op == '@':
+                    raise DIZeroDivisionError(self.line, self.pos, f"cannot divide: {lhs} {op} {rhs}")
+            return checked_division
+
+        if op == '@':
+            def checked_matmul(lhs: TResult, rhs: TResult) -> TResult:
                 try:
-                    value = lhs @ rhs
+                    return operation(lhs, rhs)
                 except TypeError as e:
                     raise DITypeError(self.line, self.pos, str(e))
                 except ValueError as e:
                     raise DIValueError(self.line, self.pos, str(e))
-            elif op == '<<':
-                value = lhs << rhs
-            elif op == '>>':
-                value = lhs >> rhs
-            else:
-                value = None
-            lhs = value
+            return checked_matmul
+
+        return operation
+
+    def finalize(self) -> None:
+        self._operations = [self._resolve_operation(op, rhs) for op, rhs in zip(self.operators, self.operands[1:])]
+        self._operand_thunks = [operand.evaluate for operand in self.operands]
+        self._steps = list(zip(self._operations, self._operand_thunks[1:]))
+
+        # most expressions have a single operator, often with a literal operand, e.g. i + 1
+        if len(self._steps) != 1:
+            self.evaluate = self.evaluate_chain
+            return
+        self._lhs = self._operand_thunks[0]
+        self._operation = self._operations[0]
+        rhs = self.operands[1]
+        if rhs.is_literal:
+            self._constant = rhs.evaluate({})
+            self.evaluate = self.evaluate_constant
+        else:
+            self._rhs = self._operand_thunks[1]
+            self.evaluate = self.evaluate_binary
+
+    def evaluate_constant(self, environment: Dict) -> TResult:
+        return self._operation(self._lhs(environment), self._constant)
+
+    def evaluate_binary(self, environment: Dict) -> TResult:
+        return self._operation(self._lhs(environment), self._rhs(environment))
+
+    def evaluate_chain(self, environment: Dict) -> TResult:
+        lhs = self._operand_thunks[0](environment)
+        for operation, operand in self._steps:
+            lhs = operation(lhs, operand(environment))
         return lhs
 
+    def evaluate(self, environment: Dict) -> TResult:
+        # shadowed by the handler bound in finalize
+        return self.evaluate_chain(environment)
+
     def serialize(self, stdout) -> None:
         # TODO: serialization
         pass
 
 
 class UnaryOperatorNode(ASTRoot):
+    _fields = ('operand',)
+
     def __init__(self, line: int, pos: int, operator: str, operand: ASTRoot) -> None:
         super().__init__(line, pos)
         self.operator = operator
         self.operand = operand
+        self.evaluate = self._DISPATCH[operator].__get__(self, UnaryOperatorNode)
+
+    def evaluate_neg(self, environment: Dict) -> TResult:
+        return -self.operand.evaluate(environment)
+
+    def evaluate_pos(self, environment: Dict) -> TResult:
+        # unary plus leaves any value as it is, e.g. +true stays a boolean
+        return self.operand.evaluate(environment)
+
+    def evaluate_invert(self, environment: Dict) -> TResult:
+        return ~self.operand.evaluate(environment)
+
+    def evaluate_not(self, environment: Dict) -> bool:
+        return not self.operand.evaluate(environment)
+
+    def evaluate_len(self, environment: Dict) -> int:
+        return len(self.operand.evaluate(environment))
+
+    _DISPATCH: Dict[str, Callable[["UnaryOperatorNode", Dict], TResult]] = {
+        '-': evaluate_neg,
+        '+': evaluate_pos,
+        '~': evaluate_invert,
+        'not': evaluate_not,
+        '#': evaluate_len,
+    }
 
     def evaluate(self, environment: Dict) -> TResult:
-        if self.operator == '-':
-            return -self.operand.evaluate(environment)
-        elif self.operator == '+':
-            return self.operand.evaluate(environment)
-        elif self.operator == '~':
-            return ~self.operand.evaluate(environment)
-        elif self.operator == 'not':
-            return not self.operand.evaluate(environment)
-        elif self.operator == '#':
-            return len(self.operand.evaluate(environment))
-
-        raise NotImplemented
+        # shadowed by the handler bound in __init__
+        return self._DISPATCH[self.operator](self, environment)
 
     def serialize(self, stdout) -> None:
         # TODO: serialization
         pass
 
 
+def referenced_names(node: ASTRoot) -> Set[str]:
+    """
+    Names of all variables the node might read or assign, nested function bodies included.
+    Names of accessed members are not variables, so they're skipped
+    """
+    names = set()
+    pending = [node]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, IdentifierNode):
+            names.add(current.name)
+        elif isinstance(current, OperatorNode) and current.operator == '$attr':
+            pending.append(current.operands[0])
+        else:
+            pending.extend(current.children())
+    return names
+
+
+def memoizable_calls(node: ASTRoot) -> Optional[Set[str]]:
+    """
+    Names of the functions called by the node, if all of them are called directly by name
+    and none of these names is reassigned inside the node. Otherwise, None
+    """
+    called = set()
+    targets = set()
+    pending = [node]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, OperatorNode) and current.operator == '$func':
+            callee = current.operands[0]
+            if len(current.operands) != 2 or not isinstance(callee, IdentifierNode):
+                return None
+            called.add(callee.name)
+        elif isinstance(current, AssignmentNode):
+            for target in current.chain_of_assignments[:-1]:
+                targets.update(referenced_names(target))
+        pending.extend(current.children())
+
+    if called & targets:
+        return None
+    return called
+
+
 class FunctionDeclarationNode(ASTRoot):
+    __slots__ = (
+        'params', 'body', 'parent_scope',
+        '_param_names', '_captured_names', '_compiled', '_memoizable_calls', '_run_body'
+    )
+    _fields = ('params', 'body')
+
+    # the body is compiled to native Python lazily, see codegen
+    _NOT_COMPILED = object()
+    # errors of operations on unsupported values and of free names missing from the environment,
+    # anything else is a bug of the generated code
+    _COMPILED_ERRORS = (ArithmeticError, TypeError, ValueError, KeyError)
+
+    # calls are memoized only for these types of arguments and results,
+    # so that cached values can't be modified and equal keys mean equal arguments
+    MEMO_SIZE = 4096
+    _MEMO_ARGUMENT_TYPES = (type(None), bool, int, str)
+    _MEMO_RESULT_TYPES = (type(None), bool, int, float, complex, str)
+    _MISSING = object()
+
     def __init__(self, line: int, pos: int, params: list["IdentifierNode"], scope: ScopeNode) -> None:
         super().__init__(line, pos)
         self.params = params
         self.body = scope
         self.parent_scope = None
+        self.finalize()
+
+    def finalize(self) -> None:
+        # the body can't see anything else of the enclosing environment
+        self._param_names = tuple(param.name for param in self.params)
+        param_names = set(self._param_names)
+        self._captured_names = tuple(referenced_names(self.body) - param_names)
+        self._compiled = self._NOT_COMPILED
+        # functions called only by name, e.g. fib(n - 1), see memoize
+        calls = memoizable_calls(self.body)
+        self._memoizable_calls = None if calls is None or calls & param_names else tuple(calls)
+        # replaced with the compiled body when the function is compiled to bytecode
+        self._run_body = self.body.evaluate
 
     def __repr__(self) -> str:
-        return super(self).__repr__() + f'(params count: {len(self.params)})'
+        return super().__repr__() + f'(params count: {len(self.params)})'
 
     def evaluate(self, environment: Dict) -> Callable:
+        func = self._bind(environment)
+
+        if self._compiled is self._NOT_COMPILED:
+            from .codegen import compile_function
+            self._compiled = compile_function(self)
+
+        compiled = self._compiled
+        if compiled is not None:
+            func = self._with_compiled(func, compiled, environment)
+
+        if self._memoizable_calls is not None:
+            func = self._memoize(func, environment)
+
+        return func
+
+    def _bind(self, environment: Dict) -> Callable:
+        # everything the calls need is looked up once per evaluation, not once per call
+        captured_names = self._captured_names
+        param_names = self._param_names
+        run_body = self._run_body
+
         def func(params):
-            environment_copy = environment.copy()
+            environment_copy = {name: environment[name] for name in captured_names if name in environment}
             try:
-                for (param, arg) in zip(self.params, params, strict=True):
-                    environment_copy[param.name] = arg
-                return self.body.evaluate(environment_copy)
+                environment_copy.update(zip(param_names, params, strict=True))
+                return run_body(environment_copy)
             except ValueError as e:
                 # TODO:
                 #  1. better msg info
@@ -511,19 +1142,73 @@ class FunctionDeclarationNode(ASTRoot):
 
         return func
 
+    def _with_compiled(self, func: Callable, compiled: Callable, environment: Dict) -> Callable:
+        params_count = len(self.params)
+
+        def compiled_func(params):
+            if len(params) == params_count:
+                try:
+                    return compiled(environment, *params)
+                except self._COMPILED_ERRORS:
+                    # compiled code has no side effects, so let the interpreter raise the exact error
+                    pass
+            return func(params)
+
+        return compiled_func
+
+    def _memoize(self, func: Callable, environment: Dict) -> Callable:
+        """
+        A call may be cached when it depends on nothing but immutable arguments
+        and hashable values of the names the body uses, which are part of the key along with their types.
+        Functions can't change anything outside their copy of the environment,
+        unless they call other functions, so only calls of the function itself are allowed.
+        Mutable values reachable from the key are unhashable, and such calls aren't cached
+        """
+        cache = {}
+        captured_names = self._captured_names
+        called_names = self._memoizable_calls
+
+        def memoized(params):
+            if any(environment.get(name) is not memoized for name in called_names):
+                return func(params)
+            if not all(type(param) in self._MEMO_ARGUMENT_TYPES for param in params):
+                return func(params)
+
+            # equal values of different types, e.g. 1, 1.0 and true, hash the same
+            captured = tuple(environment.get(name, self._MISSING) for name in captured_names)
+            key = (tuple(map(type, params)), tuple(params), tuple(map(type, captured)), captured)
+            try:
+                return cache[key]
+            except KeyError:
+                pass
+            except TypeError:
+                return func(params)
+
+            result = func(params)
+            if type(result) in self._MEMO_RESULT_TYPES:
+                if len(cache) >= self.MEMO_SIZE:
+                    cache.clear()
+                cache[key] = result
+            return result
+
+        return memoized
+
     def serialize(self, stdout) -> None:
         # TODO: serialization
         pass
 
 
 class ClassDeclarationNode(ASTRoot):
+    __slots__ = ('params', 'body')
+    _fields = ('params', 'body')
+
     def __init__(self, line: int, pos: int, params: list["IdentifierNode"], scope: ScopeNode) -> None:
         super().__init__(line, pos)
         self.params = params
         self.body = scope
 
     def __repr__(self) -> str:
-        return super(self).__repr__() + f'(params count: {len(self.params)})'
+        return super().__repr__() + f'(params count: {len(self.params)})'
 
     def evaluate(self, environment: Dict) -> Callable:
         def func(params):
@@ -541,6 +1226,9 @@ class ClassDeclarationNode(ASTRoot):
 
 
 class EllipsisOperatorNode(ASTRoot):
+    __slots__ = ('elements',)
+    _fields = ('elements',)
+
     def __init__(self, line: int, pos: int, list_value: "ListNode") -> None:
         super().__init__(line, pos)
         self.elements = list_value
@@ -556,6 +1244,9 @@ class EllipsisOperatorNode(ASTRoot):
 
 
 class NumberNode(ASTRoot):
+    __slots__ = ('number',)
+    is_literal = True
+
     def __init__(self, line: int, pos: int, number: Union[int, float, complex]) -> None:
         super().__init__(line, pos)
         self.number = number
@@ -569,6 +1260,9 @@ class NumberNode(ASTRoot):
 
 
 class BooleanNode(ASTRoot):
+    __slots__ = ('value',)
+    is_literal = True
+
     def __init__(self, line: int, pos: int, value: str) -> None:
         super().__init__(line, pos)
         if value == 'true':
@@ -587,6 +1281,9 @@ class BooleanNode(ASTRoot):
 
 
 class NullNode(ASTRoot):
+    __slots__ = ()
+    is_literal = True
+
     def __init__(self, line: int, pos: int) -> None:
         super().__init__(line, pos)
 
@@ -599,9 +1296,15 @@ class NullNode(ASTRoot):
 
 
 class StringNode(ASTRoot):
+    __slots__ = ('string',)
+    is_literal = True
+
+    # short strings are often used as keys, e.g. of members, so keep one copy of each
+    MAX_INTERNED_SIZE = 64
+
     def __init__(self, line: int, pos: int, string: str) -> None:
         super().__init__(line, pos)
-        self.string = string
+        self.string = sys.intern(string) if len(string) <= self.MAX_INTERNED_SIZE else string
 
     def evaluate(self, environment: Dict) -> str:
         return self.string
@@ -612,9 +1315,26 @@ class StringNode(ASTRoot):
 
 
 class ListNode(ASTRoot):
+    _fields = ('elements',)
+
     def __init__(self, line: int, pos: int, elements: List[ASTRoot]) -> None:
         super().__init__(line, pos)
         self.elements = elements
+        self.finalize()
+
+    def finalize(self) -> None:
+        self._ellipsis_mask = [isinstance(e, EllipsisOperatorNode) for e in self.elements]
+        self._eval_thunks = [e.evaluate for e in self.elements]
+        self._has_ellipsis = any(self._ellipsis_mask)
+        self._ellipsis_indices = [idx for idx, is_ellipsis in enumerate(self._ellipsis_mask) if is_ellipsis]
+        # most lists have no ellipsis, so they don't need the general loop
+        if self._has_ellipsis:
+            self.evaluate = self.evaluate_spread
+        elif all(e.is_literal for e in self.elements):
+            self._values = [e.evaluate({}) for e in self.elements]
+            self.evaluate = self.evaluate_literal
+        else:
+            self.evaluate = self.evaluate_flat
 
     def __iter__(self) -> Iterator[ASTRoot]:
         return iter(self.elements)
@@ -625,33 +1345,49 @@ class ListNode(ASTRoot):
     def __getitem__(self, item: int) -> ASTRoot:
         return self.elements[item]
 
-    def evaluate(self, environment: Dict) -> ListWrapper:
+    def evaluate_literal(self, environment: Dict) -> ListWrapper:
+        # lists are mutable, so every evaluation gets its own copy
+        return ListWrapper(self._values.copy())
+
+    def evaluate_flat(self, environment: Dict) -> ListWrapper:
+        return ListWrapper([evaluate(environment) for evaluate in self._eval_thunks])
+
+    def evaluate_spread(self, environment: Dict) -> ListWrapper:
         result = []
-        for e in self.elements:
-            if isinstance(e, EllipsisOperatorNode):
-                result.extend(e.evaluate(environment, in_list=True))
+        for is_ellipsis, evaluate in zip(self._ellipsis_mask, self._eval_thunks):
+            if is_ellipsis:
+                result.extend(evaluate(environment, in_list=True))
             else:
-                result.append(e.evaluate(environment))
+                result.append(evaluate(environment))
         return ListWrapper(result)
 
+    def evaluate(self, environment: Dict) -> ListWrapper:
+        # shadowed by the handler bound in finalize
+        if self._has_ellipsis:
+            return self.evaluate_spread(environment)
+        return self.evaluate_flat(environment)
+
     def serialize(self, stdout) -> None:
         # TODO: serialization
         pass
 
 
 class IdentifierNode(ASTRoot):
+    __slots__ = ('name',)
 
     def __init__(self, line: int, pos: int, name: str) -> None:
         super().__init__(line, pos)
-        self.name = name
+        # environment keys are compared by identity first, so keep one copy of each name
+        self.name = sys.intern(name)
 
     def __repr__(self) -> str:
-        return super(self).__repr__() + f'({self.name})'
+        return super().__repr__() + f'({self.name})'
 
     def evaluate(self, environment: Dict) -> TResult:
-        if self.name in environment:
+        try:
             return environment[self.name]
-        raise DINameError(self.line, self.pos, f"Variable {self.name} is not defined")
+        except KeyError:
+            raise DINameError(self.line, self.pos, f"Variable {self.name} is not defined") from None
 
     def serialize(self, stdout) -> None:
         # TODO: serialization
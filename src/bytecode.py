@@ -0,0 +1,351 @@
+"""
+Compilation of the AST into flat bytecode, executed by a single dispatch loop.
+Nodes the compiler doesn't know are embedded as is and evaluated by the tree walker
+"""
+import operator
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .ast import (
+    ASTRoot, ScopeNode, IfElseNode, WhileNode, AssignmentNode, FunctionDeclarationNode,
+    OperatorNode, SingleComparisonNode, LeftPolyOperatorNode, UnaryOperatorNode,
+    IdentifierNode, ListNode, EllipsisOperatorNode, truncate_environment
+)
+from .exceptions import DINameError, DITypeError, DIIndexError, DIRuntimeSyntaxError
+from .typing import ListWrapper, TResult
+
+# (opcode, argument, source node)
+TInstruction = Tuple[int, Any, Optional[ASTRoot]]
+
+# opcodes, roughly in the order of frequency
+LOAD_NAME = 0
+LOAD_CONST = 1
+BINARY_OP = 2
+STORE_NAME = 3
+STORE_NAME_RETURN_OLD = 4
+JUMP_IF_FALSE = 5
+JUMP = 6
+POP_TOP = 7
+EVAL_NODE = 8
+UNARY_OP = 9
+JUMP_IF_FALSE_OR_POP = 10
+JUMP_IF_TRUE_OR_POP = 11
+BUILD_LIST = 12
+SCOPE_ENTER = 13
+SCOPE_EXIT = 14
+LOOP_ENTER = 15
+LOOP_EXIT = 16
+CALL = 17
+INDEX = 18
+ASSIGN_ENTER = 19
+CHECK_CALLABLE = 20
+
+_UNARY_OPERATIONS: Dict[str, Callable[[TResult], TResult]] = {
+    '-': operator.neg,
+    '~': operator.invert,
+    'not': operator.not_,
+    '#': len,
+}
+
+
+class Compiler:
+    """
+    Translates a tree into a list of instructions for `run`.
+    Every compiled expression leaves exactly one value on the stack
+    """
+
+    def __init__(self) -> None:
+        self.code: List[TInstruction] = []
+
+    def compile_program(self, tree: ScopeNode, flush_variables: bool = True) -> List[TInstruction]:
+        self.compile_scope(tree, flush_variables)
+        return self.code
+
+    def emit(self, opcode: int, argument: Any = None, node: Optional[ASTRoot] = None) -> int:
+        self.code.append((opcode, argument, node))
+        return len(self.code) - 1
+
+    def patch(self, index: int) -> None:
+        # make the jump at index lead to the next instruction to be emitted
+        opcode, _, node = self.code[index]
+        self.code[index] = (opcode, len(self.code), node)
+
+    def compile(self, node: ASTRoot) -> None:
+        for cls in type(node).__mro__:
+            method = self._VISITORS.get(cls)
+            if method is not None:
+                method(self, node)
+                return
+        self.emit(EVAL_NODE, node.evaluate, node)
+
+    def compile_scope(self, node: ScopeNode, flush_variables: bool = True) -> None:
+        if flush_variables:
+            self.emit(SCOPE_ENTER)
+
+        if not node.instructions:
+            self.emit(LOAD_CONST, None)
+        for idx, instruction in enumerate(node.instructions):
+            if idx:
+                self.emit(POP_TOP)
+            self.compile(instruction)
+
+        if flush_variables:
+            self.emit(SCOPE_EXIT)
+
+    def compile_if_else(self, node: IfElseNode) -> None:
+        jumps_to_end = []
+        for condition, scope in zip(node.conditions, node.branch_scopes):
+            self.compile(condition)
+            jump_to_next = self.emit(JUMP_IF_FALSE)
+            self.compile(scope)
+            jumps_to_end.append(self.emit(JUMP))
+            self.patch(jump_to_next)
+
+        if node.else_scope is not None:
+            self.compile(node.else_scope)
+        else:
+            self.emit(LOAD_CONST, None)
+
+        for jump in jumps_to_end:
+            self.patch(jump)
+
+    def compile_while(self, node: WhileNode) -> None:
+        frames = node._invariant_frames
+        if frames is not None:
+            self.emit(LOOP_ENTER, frames)
+
+        self.emit(LOAD_CONST, None)
+        start = len(self.code)
+        self.compile(node.condition)
+        jump_to_end = self.emit(JUMP_IF_FALSE)
+        self.emit(POP_TOP)
+        self.compile(node.scope)
+        self.emit(JUMP, start)
+        self.patch(jump_to_end)
+
+        if frames is not None:
+            self.emit(LOOP_EXIT)
+
+    def compile_assignment(self, node: AssignmentNode) -> None:
+        if len(node.chain_of_assignments) != 2 or not isinstance(node.chain_of_assignments[0], IdentifierNode):
+            self.emit(EVAL_NODE, node.evaluate, node)
+            return
+
+        target, value = node.chain_of_assignments
+        # errors raised until the store are translated as AssignmentNode.evaluate does
+        self.emit(ASSIGN_ENTER, None, node)
+        self.compile(value)
+        if node.chain_of_orders[0]:
+            self.emit(STORE_NAME_RETURN_OLD, target.name, target)
+        else:
+            self.emit(STORE_NAME, target.name, target)
+
+    def compile_operator(self, node: OperatorNode) -> None:
+        if node.operator == '$func':
+            self.compile_call(node)
+            return
+        if node.operator == '$index':
+            self.compile_indexation(node)
+            return
+        if node.operator not in ('or', 'and'):
+            self.emit(EVAL_NODE, node.evaluate, node)
+            return
+
+        opcode = JUMP_IF_TRUE_OR_POP if node.operator == 'or' else JUMP_IF_FALSE_OR_POP
+        jumps_to_end = []
+        for operand in node.operands[:-1]:
+            self.compile(operand)
+            jumps_to_end.append(self.emit(opcode))
+        self.compile(node.operands[-1])
+
+        for jump in jumps_to_end:
+            self.patch(jump)
+
+    def compile_call(self, node: OperatorNode) -> None:
+        primary, *calls = node.operands
+        self.compile(primary)
+        for arguments in calls:
+            # the callee is checked before its arguments run, as in OperatorNode.evaluate_func_call
+            self.emit(CHECK_CALLABLE, None, node)
+            for argument in arguments:
+                self.compile(argument)
+            self.emit(CALL, len(arguments), node)
+
+    def compile_indexation(self, node: OperatorNode) -> None:
+        primary, *indexers = node.operands
+        self.compile(primary)
+        for group in indexers:
+            for index in group:
+                self.compile(index)
+                self.emit(INDEX, None, node)
+
+    def compile_left_poly_operator(self, node: LeftPolyOperatorNode) -> None:
+        self.compile(node.operands[0])
+        for operation, operand in zip(node._operations, node.operands[1:]):
+            self.compile(operand)
+            self.emit(BINARY_OP, operation, node)
+
+    def compile_comparison(self, node: SingleComparisonNode) -> None:
+        lhs, rhs = node.operands
+        self.compile(lhs)
+        self.compile(rhs)
+        self.emit(BINARY_OP, node._OPERATION, node)
+
+    def compile_unary_operator(self, node: UnaryOperatorNode) -> None:
+        self.compile(node.operand)
+        # unary plus leaves the value as it is
+        if node.operator != '+':
+            self.emit(UNARY_OP, _UNARY_OPERATIONS[node.operator], node)
+
+    def compile_identifier(self, node: IdentifierNode) -> None:
+        self.emit(LOAD_NAME, node.name, node)
+
+    def compile_list(self, node: ListNode) -> None:
+        if any(isinstance(element, EllipsisOperatorNode) for element in node.elements):
+            self.emit(EVAL_NODE, node.evaluate, node)
+            return
+
+        for element in node.elements:
+            self.compile(element)
+        self.emit(BUILD_LIST, len(node.elements))
+
+    def compile_function_declaration(self, node: FunctionDeclarationNode) -> None:
+        # the body runs on a copy of the environment, so its variables needn't be flushed
+        node._run_body = partial(run, Compiler().compile_program(node.body, False))
+        self.emit(EVAL_NODE, node.evaluate, node)
+
+    def compile_node(self, node: ASTRoot) -> None:
+        if node.is_literal:
+            self.emit(LOAD_CONST, node.evaluate({}), node)
+        else:
+            self.emit(EVAL_NODE, node.evaluate, node)
+
+    _VISITORS: Dict[type, Callable[["Compiler", Any], None]] = {
+        ScopeNode: compile_scope,
+        IfElseNode: compile_if_else,
+        WhileNode: compile_while,
+        AssignmentNode: compile_assignment,
+        OperatorNode: compile_operator,
+        LeftPolyOperatorNode: compile_left_poly_operator,
+        SingleComparisonNode: compile_comparison,
+        UnaryOperatorNode: compile_unary_operator,
+        IdentifierNode: compile_identifier,
+        ListNode: compile_list,
+        FunctionDeclarationNode: compile_function_declaration,
+        ASTRoot: compile_node,
+    }
+
+
+def compile_program(tree: ScopeNode, flush_variables: bool = True) -> List[TInstruction]:
+    return Compiler().compile_program(tree, flush_variables)
+
+
+def run(code: List[TInstruction], environment: Dict) -> TResult:
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    # invariant caches of the loops being run, see WhileNode
+    loops = []
+    # sizes of the environment when the scopes being run were entered
+    scopes = []
+    # assignments whose values are being computed
+    assignments = []
+
+    pc = 0
+    end = len(code)
+    try:
+        while pc < end:
+            opcode, argument, node = code[pc]
+            pc += 1
+
+            if opcode == LOAD_NAME:
+                try:
+                    push(environment[argument])
+                except KeyError:
+                    raise DINameError(node.line, node.pos, f"Variable {argument} is not defined") from None
+            elif opcode == LOAD_CONST:
+                push(argument)
+            elif opcode == BINARY_OP:
+                rhs = pop()
+                stack[-1] = argument(stack[-1], rhs)
+            elif opcode == ASSIGN_ENTER:
+                assignments.append(node)
+            elif opcode == STORE_NAME:
+                assignments.pop()
+                environment[argument] = stack[-1]
+            elif opcode == STORE_NAME_RETURN_OLD:
+                assignments.pop()
+                old_value = environment.get(argument, None)
+                environment[argument] = stack[-1]
+                stack[-1] = old_value
+            elif opcode == JUMP_IF_FALSE:
+                if not pop():
+                    pc = argument
+            elif opcode == JUMP:
+                pc = argument
+            elif opcode == POP_TOP:
+                pop()
+            elif opcode == EVAL_NODE:
+                push(argument(environment))
+            elif opcode == UNARY_OP:
+                stack[-1] = argument(stack[-1])
+            elif opcode == JUMP_IF_FALSE_OR_POP:
+                if not stack[-1]:
+                    pc = argument
+                else:
+                    pop()
+            elif opcode == JUMP_IF_TRUE_OR_POP:
+                if stack[-1]:
+                    pc = argument
+                else:
+                    pop()
+            elif opcode == BUILD_LIST:
+                if argument:
+                    elements = stack[-argument:]
+                    del stack[-argument:]
+                else:
+                    elements = []
+                push(ListWrapper(elements))
+            elif opcode == CALL:
+                if argument:
+                    arguments = stack[-argument:]
+                    del stack[-argument:]
+                else:
+                    arguments = []
+                stack[-1] = stack[-1](arguments)
+            elif opcode == CHECK_CALLABLE:
+                if not callable(stack[-1]):
+                    raise DITypeError(node.line, node.pos, f'Not a function: {stack[-1]}')
+            elif opcode == INDEX:
+                key = pop()
+                try:
+                    stack[-1] = stack[-1][key]
+                except IndexError as e:
+                    raise DIIndexError(node.line, node.pos, str(e))
+            elif opcode == SCOPE_ENTER:
+                scopes.append(len(environment))
+            elif opcode == SCOPE_EXIT:
+                truncate_environment(environment, scopes.pop())
+            elif opcode == LOOP_ENTER:
+                argument.append({})
+                loops.append(argument)
+            elif opcode == LOOP_EXIT:
+                loops.pop().pop()
+    except ValueError as e:
+        if not assignments:
+            raise
+        node = assignments[-1]
+        raise DIRuntimeSyntaxError(node.line, node.pos, str(e))
+    except IndexError as e:
+        if not assignments:
+            raise
+        node = assignments[-1]
+        raise DIIndexError(node.line, node.pos, str(e))
+    finally:
+        for frames in loops:
+            frames.pop()
+        # scopes left by an error are flushed as well, the outermost one covers the rest
+        if scopes:
+            truncate_environment(environment, scopes[0])
+
+    return stack[-1]
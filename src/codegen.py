@@ -0,0 +1,229 @@
+"""
+Translation of pure arithmetic functions into Python source, compiled natively by CPython.
+Only bodies without calls, containers, strings and member access are translated;
+anything else stays with the tree walker
+"""
+import math
+from typing import Callable, List, Optional, Set
+
+from .ast import (
+    ASTRoot, ScopeNode, IfElseNode, WhileNode, InvariantNode, LazyConstantNode,
+    IdentifierAssignmentNode, FunctionDeclarationNode,
+    OperatorNode, ComparisonNode, SingleComparisonNode, LeftPolyOperatorNode, UnaryOperatorNode,
+    IdentifierNode, NumberNode, BooleanNode, NullNode
+)
+
+
+_BINARY_OPERATORS = ('+', '-', '*', '/', '//', '%', '<<', '>>')
+# unary plus leaves the value as it is, e.g. +true stays a boolean
+_UNARY_OPERATORS = {'-': '-', '+': '', '~': '~', 'not': 'not '}
+_BITWISE_OPERATORS = {'^': '^', '&': '&', '|': '|'}
+
+
+class UnsupportedNode(Exception):
+    pass
+
+
+class SourceGenerator:
+    """
+    Generates the source of a Python function computing the same value as a function body.
+
+    Variables created in a scope are deleted when the scope exits, which Python doesn't do.
+    So a variable is only read when it's known to be defined at that point
+    in the same way as the tree walker would see it, otherwise generation fails.
+    Variables read before any assignment are taken from the enclosing environment.
+
+    The generated code has no side effects, so whenever it raises,
+    the tree walker can simply be run instead to get the exact error
+    """
+
+    def __init__(self, params: List[str]) -> None:
+        self.lines: List[str] = []
+        self.indent = 1
+        self.temporaries = 0
+        self.params = params
+        # names read before any assignment, taken from the enclosing environment
+        self.free_names: List[str] = []
+        # names defined at this point, one set per open scope
+        self.scopes: List[Set[str]] = [set(params)]
+        # names assigned anywhere so far
+        self.assigned_names: Set[str] = set()
+
+    def generate(self, body: ScopeNode) -> str:
+        result = self.generate_scope(body, flush_variables=False)
+        params = ''.join(f', {self.variable(name)}' for name in self.params)
+
+        header = [f'def compiled(_env{params}):']
+        for name in self.free_names:
+            header.append(f'    {self.variable(name)} = _env[{name!r}]')
+        return '\n'.join(header + self.lines + [f'    return {result}']) + '\n'
+
+    @staticmethod
+    def variable(name: str) -> str:
+        return f'v_{name}'
+
+    def emit(self, line: str) -> None:
+        self.lines.append('    ' * self.indent + line)
+
+    def temporary(self) -> str:
+        self.temporaries += 1
+        return f'_t{self.temporaries}'
+
+    def is_defined(self, name: str) -> bool:
+        return name in self.free_names or any(name in scope for scope in self.scopes)
+
+    def define(self, name: str) -> None:
+        if not self.is_defined(name):
+            self.scopes[-1].add(name)
+
+    def generate_scope(self, node: ScopeNode, flush_variables: bool = True) -> str:
+        if flush_variables:
+            self.scopes.append(set())
+
+        result = self.temporary()
+        self.emit(f'{result} = None')
+        for instruction in node.instructions:
+            self.generate_statement(instruction, result)
+
+        if flush_variables:
+            self.scopes.pop()
+        return result
+
+    def generate_statement(self, node: ASTRoot, result: str) -> None:
+        if isinstance(node, IfElseNode):
+            # names assigned in conditions after the first one, which might be skipped,
+            # aren't defined afterwards
+            snapshot = None
+            keyword = 'if'
+            for condition, scope in zip(node.conditions, node.branch_scopes):
+                self.emit(f'{keyword} {self.generate_expression(condition)}:')
+                if snapshot is None:
+                    snapshot = [names.copy() for names in self.scopes]
+                self.generate_block(scope, result)
+                keyword = 'elif'
+            self.emit('else:')
+            if node.else_scope is not None:
+                self.generate_block(node.else_scope, result)
+            else:
+                self.emit(f'    {result} = None')
+            if snapshot is not None:
+                self.scopes = snapshot
+
+        elif isinstance(node, WhileNode):
+            self.emit(f'{result} = None')
+            # names assigned in the condition are defined for the body and after the loop,
+            # as the condition is evaluated at least once
+            self.emit(f'while {self.generate_expression(node.condition)}:')
+            self.generate_block(node.scope, result)
+
+        else:
+            self.emit(f'{result} = {self.generate_expression(node)}')
+
+    def generate_block(self, scope: ScopeNode, result: str) -> None:
+        self.indent += 1
+        value = self.generate_scope(scope)
+        self.emit(f'{result} = {value}')
+        self.indent -= 1
+
+    def generate_expression(self, node: ASTRoot, ordered: bool = True) -> str:
+        """
+        `ordered` is false when the tree walker evaluates operands in another order than Python,
+        or evaluates some of them twice, so they must not assign anything
+        """
+        if isinstance(node, (InvariantNode, LazyConstantNode)):
+            return self.generate_expression(node.expression, ordered)
+
+        if isinstance(node, IdentifierNode):
+            if not node.name.isidentifier():
+                raise UnsupportedNode(node)
+            if not self.is_defined(node.name):
+                if node.name in self.assigned_names:
+                    # created in a closed scope, so whether it still exists depends on the enclosing environment
+                    raise UnsupportedNode(node)
+                self.free_names.append(node.name)
+            return self.variable(node.name)
+
+        if isinstance(node, NumberNode):
+            if isinstance(node.number, (float, complex)) and not math.isfinite(abs(node.number)):
+                raise UnsupportedNode(node)
+            return f'({node.number!r})'
+        if isinstance(node, BooleanNode):
+            return repr(node.value)
+        if isinstance(node, NullNode):
+            return 'None'
+
+        if isinstance(node, IdentifierAssignmentNode):
+            if not ordered:
+                raise UnsupportedNode(node)
+            target, value = node.chain_of_assignments
+            if not target.name.isidentifier():
+                raise UnsupportedNode(node)
+            value_source = self.generate_expression(value)
+            self.define(target.name)
+            self.assigned_names.add(target.name)
+            return f'({self.variable(target.name)} := {value_source})'
+
+        if isinstance(node, SingleComparisonNode):
+            lhs, rhs = node.operands
+            return f'({self.generate_expression(lhs, ordered)} {node.operators[0]} {self.generate_expression(rhs, ordered)})'
+
+        if isinstance(node, ComparisonNode):
+            # evaluated once each and short-circuited as in Python,
+            # so names assigned after the first operand aren't defined afterwards
+            source = self.generate_expression(node.operands[0], ordered)
+            snapshot = [scope.copy() for scope in self.scopes]
+            for op, operand in zip(node.operators, node.operands[1:]):
+                source += f' {op} {self.generate_expression(operand, ordered)}'
+            self.scopes = snapshot
+            return f'({source})'
+
+        if isinstance(node, LeftPolyOperatorNode):
+            if any(op not in _BINARY_OPERATORS for op in node.operators):
+                raise UnsupportedNode(node)
+            source = self.generate_expression(node.operands[0], ordered)
+            for op, operand in zip(node.operators, node.operands[1:]):
+                source = f'({source} {op} {self.generate_expression(operand, ordered)})'
+            return source
+
+        if isinstance(node, UnaryOperatorNode):
+            if node.operator not in _UNARY_OPERATORS:
+                raise UnsupportedNode(node)
+            return f'({_UNARY_OPERATORS[node.operator]}{self.generate_expression(node.operand, ordered)})'
+
+        if isinstance(node, OperatorNode):
+            if node.operator in ('or', 'and'):
+                # names assigned in operands which might be skipped aren't defined afterwards
+                first, *rest = node.operands
+                source = self.generate_expression(first, ordered)
+                snapshot = [scope.copy() for scope in self.scopes]
+                for operand in rest:
+                    source += f' {node.operator} {self.generate_expression(operand, ordered)}'
+                self.scopes = snapshot
+                return f'({source})'
+            if node.operator == '**':
+                operands = [self.generate_expression(operand, False) for operand in node.operands]
+                return f"({' ** '.join(operands)})"
+            if node.operator in _BITWISE_OPERATORS:
+                operands = [self.generate_expression(operand, ordered) for operand in node.operands]
+                return f"({f' {_BITWISE_OPERATORS[node.operator]} '.join(operands)})"
+
+        raise UnsupportedNode(node)
+
+
+def compile_function(node: FunctionDeclarationNode) -> Optional[Callable]:
+    """
+    Compile the body of the function into a native Python function taking
+    the enclosing environment and the arguments, or return None if it's not supported
+    """
+    params = [param.name for param in node.params]
+    if not all(name.isidentifier() for name in params) or len(set(params)) != len(params):
+        return None
+
+    try:
+        source = SourceGenerator(params).generate(node.body)
+    except UnsupportedNode:
+        return None
+
+    namespace = {}
+    exec(compile(source, f'<function at line {node.line}>', 'exec'), namespace)
+    return namespace['compiled']
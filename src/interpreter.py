@@ -1,54 +1,71 @@
 """
 Combined lexer and parser
 """
+from typing import Dict, List, Tuple
+
+from src.ast import ScopeNode
 from src.parser import Parser
 from src.lexer import Lexer
+from src.optimizer import optimize
+from src.bytecode import compile_program, run, TInstruction
 
 
 class MiniInterpreter:
 
-    def __init__(self) -> None:
+    # sources executed repeatedly, e.g. in a REPL, are parsed and optimized only once
+    CACHE_SIZE = 256
+
+    def __init__(self, use_bytecode: bool = False) -> None:
         self.environment = {}
+        self.use_bytecode = use_bytecode
+        self._trees: Dict[str, ScopeNode] = {}
+        self._programs: Dict[Tuple[str, bool], List[TInstruction]] = {}
+
+    def parse(self, src: str) -> ScopeNode:
+        tree = self._trees.get(src)
+        if tree is None:
+            if len(self._trees) >= self.CACHE_SIZE:
+                self._trees.clear()
+            tree = self._trees[src] = optimize(Parser(Lexer(src)).parse_program())
+        return tree
+
+    def compile(self, src: str, flush_variables: bool) -> List[TInstruction]:
+        key = (src, flush_variables)
+        code = self._programs.get(key)
+        if code is None:
+            if len(self._programs) >= self.CACHE_SIZE:
+                self._programs.clear()
+            code = self._programs[key] = compile_program(self.parse(src), flush_variables)
+        return code
+
+    def run(self, src: str, flush_variables: bool):
+        if self.use_bytecode:
+            return run(self.compile(src, flush_variables), self.environment)
+        return self.parse(src).evaluate(self.environment, flush_variables)
 
     def import_module(self, src: str):
-        try:
-            parser = Parser(Lexer(src))
-            tree = parser.parse_program()
-            tree.evaluate(self.environment, False)
-        finally:
-            pass
+        self.run(src, False)
 
     def execute(self, src: str):
-        try:
-            parser = Parser(Lexer(src))
-            tree = parser.parse_program()
-            return tree.evaluate(self.environment)
-        # TEMP
-        finally:
-            pass
+        return self.run(src, True)
+
+    def clear(self):
+        self.environment.clear()
+        self._trees.clear()
+        self._programs.clear()
 
 
-class Interpreter:
+class Interpreter(MiniInterpreter):
 
     def __init__(self) -> None:
-        self.environment = {}
+        super().__init__()
         self.result = None
 
     def execute(self, src: str):
-        try:
-            lexer = Lexer(src)
-            parser = Parser(lexer)
-            tree = parser.parse_program()
-            self.result = tree.evaluate(self.environment)
-        # TEMP
-        finally:
-            pass
+        self.result = super().execute(src)
 
         # # except ExpressionError as e:
         # #     return False, str(e)
         # # except ValueError as e:
         # #     return False, str(e)
         # return result is not None, result
-
-    def clear(self):
-        self.environment.clear()
@@ -52,14 +52,23 @@ class Lexemes(IntEnum):
     END_OF_FILE = auto()
 
     @staticmethod
-    def identify_word(word: str):
-        if word in ('if', 'else', 'elif', 'while', 'function', 'class', 'promise'):
-            return Lexemes.KEYWORD
-        elif word in ('and', 'or', 'not'):
-            return Lexemes.OP_LOGICAL
-        elif word in ('true', 'false'):
-            return Lexemes.BOOLEAN
-        elif word in ('null', ):
-            return Lexemes.NULL
-        else:
-            return Lexemes.IDENTIFIER
+    def identify_word(word: str) -> int:
+        return _WORDS.get(word, IDENTIFIER)
+
+
+# bare int values of the members for the hot paths of the lexer and the parser,
+# where comparing them is cheaper than looking up and comparing enum members
+(EMPTY, STRING, NUMBER, FLOAT, INTEGER, BOOLEAN, NULL, COMMA, END_LINE, OPEN_SQUARE_BRACKET,
+    CLOSED_SQUARE_BRACKET, OPEN_BRACKET, CLOSED_BRACKET, OPEN_SCOPE, CLOSED_SCOPE, OP_ASSIGN,
+    OP_KEYMAP, OP_BITWISE_OR, OP_BITWISE_XOR, OP_BITWISE_AND, OP_LOGICAL, OP_COMPARISON,
+    OP_BITWISE_SHIFT, OP_ADDITIVE, OP_MULTIPLICATIVE, OP_POWER, OP_BITWISE_NOT, OP_INDEX,
+    OP_COALESCE, OP_ATTRIBUTE_ACCESS, OP_ELLIPSIS, OP_IMPLICATION, KEYWORD, IDENTIFIER,
+    END_OF_FILE) = map(int, Lexemes)
+
+# reserved words, any other word is an identifier
+_WORDS = {
+    **dict.fromkeys(('if', 'else', 'elif', 'while', 'function', 'class', 'promise'), KEYWORD),
+    **dict.fromkeys(('and', 'or', 'not'), OP_LOGICAL),
+    **dict.fromkeys(('true', 'false'), BOOLEAN),
+    'null': NULL,
+}
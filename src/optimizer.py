@@ -0,0 +1,444 @@
+"""
+AST rewriting passes, applied to a parsed program before evaluation
+"""
+from typing import Callable, Dict, Optional, Set
+
+from .ast import (
+    _BINARY_OPERATIONS,
+    ASTRoot,
+    OperatorNode, ComparisonNode, LeftPolyOperatorNode, UnaryOperatorNode,
+    NumberNode, BooleanNode, NullNode, StringNode, IdentifierNode, ListNode,
+    EllipsisOperatorNode, AssignmentNode, WhileNode, ScopeNode, InvariantNode, LazyConstantNode, RangeLoopNode,
+    IdentifierAssignmentNode, LessNode, LessEqualNode, GreaterNode, GreaterEqualNode, IfElseNode,
+    FunctionDeclarationNode, ClassDeclarationNode, referenced_names
+)
+from .exceptions import DIBaseException
+from .typing import TResult
+
+
+# limits for folded values, so that folding never does more work
+# than a program would do at runtime, e.g. in a branch that is never executed
+MAX_FOLDED_INT_BITS = 128
+MAX_FOLDED_STR_SIZE = 4096
+
+_FOLDABLE_OPERATORS = ('or', 'and', '?', '**', '^', '&', '|')
+
+# whether a value of an operand ends the evaluation of a short-circuit operator
+_SHORT_CIRCUITS: Dict[str, Callable[[TResult], bool]] = {
+    'or': lambda value: bool(value),
+    'and': lambda value: not value,
+    '?': lambda value: value is not None,
+}
+
+
+def optimize(tree: ASTRoot) -> ASTRoot:
+    tree = fold_constants(tree)
+    tree = specialize_counted_loops(tree)
+    tree = hoist_loop_invariants(tree)
+    return tree
+
+
+def transform(node: ASTRoot, rewrite: Callable[[ASTRoot], ASTRoot]) -> ASTRoot:
+    """
+    Rewrite the tree bottom-up: children are replaced first,
+    then the node itself is passed to `rewrite`
+    """
+    for field in node._fields:
+        setattr(node, field, _transform_value(getattr(node, field), rewrite))
+    node.finalize()
+    return rewrite(node)
+
+
+def _transform_value(value, rewrite: Callable[[ASTRoot], ASTRoot]):
+    if isinstance(value, ASTRoot):
+        return transform(value, rewrite)
+    if isinstance(value, list):
+        return [_transform_value(item, rewrite) for item in value]
+    return value
+
+
+def _replace_children(node: ASTRoot, replace: Callable[[ASTRoot], ASTRoot]) -> None:
+    def replace_value(value):
+        if isinstance(value, ASTRoot):
+            return replace(value)
+        if isinstance(value, list):
+            return [replace_value(item) for item in value]
+        return value
+
+    for field in node._fields:
+        setattr(node, field, replace_value(getattr(node, field)))
+    node.finalize()
+
+
+def assigned_names(node: ASTRoot) -> Set[str]:
+    """
+    Names of variables which might be (re)assigned while evaluating the node.
+    Function and class bodies are skipped, as they work on a copy of environment
+    """
+    names = set()
+
+    def collect_targets(target: ASTRoot) -> None:
+        if isinstance(target, IdentifierNode):
+            names.add(target.name)
+        elif isinstance(target, (ListNode, EllipsisOperatorNode)):
+            for element in target.children():
+                collect_targets(element)
+        elif isinstance(target, OperatorNode) and target.operands:
+            # containers might be modified in place
+            collect_targets(target.operands[0])
+
+    def visit(current: ASTRoot) -> None:
+        if isinstance(current, (FunctionDeclarationNode, ClassDeclarationNode)):
+            return
+        if isinstance(current, AssignmentNode):
+            for target in current.chain_of_assignments[:-1]:
+                collect_targets(target)
+        for child in current.children():
+            visit(child)
+
+    visit(node)
+    return names
+
+
+def make_literal(line: int, pos: int, value: TResult) -> Optional[ASTRoot]:
+    if value is None:
+        return NullNode(line, pos)
+    if isinstance(value, bool):
+        return BooleanNode(line, pos, 'true' if value else 'false')
+    if isinstance(value, (int, float, complex)):
+        return NumberNode(line, pos, value)
+    if isinstance(value, str):
+        return StringNode(line, pos, value)
+    return None
+
+
+def fold_constants(tree: ASTRoot) -> ASTRoot:
+    """
+    Replace operator subtrees made of literals only with a single literal.
+    Subtrees failing to evaluate are kept, so errors are still raised at runtime
+    """
+    return transform(tree, _fold)
+
+
+def _fold(node: ASTRoot) -> ASTRoot:
+    if isinstance(node, IfElseNode):
+        return _prune_branches(node)
+    if not _has_literal_operands(node):
+        if isinstance(node, OperatorNode) and node.operator in _SHORT_CIRCUITS:
+            return _prune_operands(node)
+        if isinstance(node, LeftPolyOperatorNode):
+            return _fold_prefix(node)
+        return node
+
+    if _is_expensive(node, [operand.evaluate({}) for operand in node.children()]):
+        # might never be evaluated, so it's computed on first use instead
+        return LazyConstantNode(node.line, node.pos, node)
+
+    try:
+        value = node.evaluate({})
+    except (Exception, DIBaseException):
+        return node
+
+    return make_literal(node.line, node.pos, value) or node
+
+
+def _prune_branches(node: IfElseNode) -> ASTRoot:
+    """
+    Drop branches with always false conditions and everything after an always true one
+    """
+    conditions = []
+    branch_scopes = []
+    else_scope = node.else_scope
+    for condition, scope in zip(node.conditions, node.branch_scopes):
+        if not condition.is_literal:
+            conditions.append(condition)
+            branch_scopes.append(scope)
+        elif condition.evaluate({}):
+            else_scope = scope
+            break
+
+    if not conditions:
+        if else_scope is None:
+            return NullNode(node.line, node.pos)
+        return else_scope
+
+    node.conditions = conditions
+    node.branch_scopes = branch_scopes
+    node.else_scope = else_scope
+    node.finalize()
+    return node
+
+
+def _prune_operands(node: OperatorNode) -> ASTRoot:
+    """
+    Drop literal operands of a short-circuit operator which never end its evaluation
+    and everything after one which always does, e.g. `x or 0 or y` is `x or y`
+    """
+    stops = _SHORT_CIRCUITS[node.operator]
+    operands = []
+    for operand in node.operands:
+        if not operand.is_literal:
+            operands.append(operand)
+        elif stops(operand.evaluate({})):
+            operands.append(operand)
+            break
+    else:
+        # the value of the last operand is the result
+        if not operands or operands[-1] is not node.operands[-1]:
+            operands.append(node.operands[-1])
+
+    if len(operands) == 1:
+        return operands[0]
+
+    node.operands = operands
+    node.finalize()
+    return node
+
+
+def _fold_prefix(node: LeftPolyOperatorNode) -> ASTRoot:
+    """
+    Fold the leading literal operands, e.g. `2 * 3 * x` is `6 * x`.
+    Later ones can't be folded as the operators are left associative
+    """
+    count = 0
+    while node.operands[count].is_literal:
+        count += 1
+    if count < 2:
+        return node
+
+    prefix = LeftPolyOperatorNode(node.line, node.pos, node.operators[:count - 1], node.operands[:count])
+    literal = _fold(prefix)
+    if literal is prefix:
+        return node
+
+    node.operators = node.operators[count - 1:]
+    node.operands = [literal] + node.operands[count:]
+    node.finalize()
+    return node
+
+
+def _has_literal_operands(node: ASTRoot) -> bool:
+    if isinstance(node, OperatorNode):
+        if node.operator not in _FOLDABLE_OPERATORS:
+            return False
+    elif not isinstance(node, (ComparisonNode, LeftPolyOperatorNode, UnaryOperatorNode)):
+        return False
+
+    return all(operand.is_literal for operand in node.children())
+
+
+def _is_expensive(node: ASTRoot, values: list) -> bool:
+    if isinstance(node, OperatorNode) and node.operator == '**':
+        exponent = values[-1]
+        for base in reversed(values[:-1]):
+            if isinstance(base, int) and isinstance(exponent, int):
+                if base.bit_length() * exponent > MAX_FOLDED_INT_BITS:
+                    return True
+            try:
+                exponent = base ** exponent
+            except (ArithmeticError, TypeError, ValueError):
+                return False
+
+    elif isinstance(node, LeftPolyOperatorNode):
+        lhs = values[0]
+        for op, rhs in zip(node.operators, values[1:]):
+            if op == '<<' and isinstance(rhs, int) and rhs > MAX_FOLDED_INT_BITS:
+                return True
+            if op == '*' and _repetition_size(lhs, rhs) > MAX_FOLDED_STR_SIZE:
+                return True
+            try:
+                lhs = _BINARY_OPERATIONS[op](lhs, rhs)
+            except (ArithmeticError, TypeError, ValueError, KeyError):
+                return False
+
+    return False
+
+
+def _repetition_size(lhs: TResult, rhs: TResult) -> int:
+    if isinstance(lhs, str) and isinstance(rhs, int):
+        return len(lhs) * rhs
+    if isinstance(lhs, int) and isinstance(rhs, str):
+        return lhs * len(rhs)
+    return 0
+
+
+def specialize_counted_loops(tree: ASTRoot) -> ASTRoot:
+    """
+    Replace loops shaped like while (i < n) { ...; i := i + 1 }
+    or while (i > n) { ...; i := i - 1 } with RangeLoopNode
+    """
+    return transform(tree, _specialize_loop)
+
+
+def _specialize_loop(node: ASTRoot) -> ASTRoot:
+    if type(node) is not WhileNode:
+        return node
+    if isinstance(node.condition, (LessNode, LessEqualNode)):
+        direction = '+'
+    elif isinstance(node.condition, (GreaterNode, GreaterEqualNode)):
+        direction = '-'
+    else:
+        return node
+
+    counter, stop = node.condition.operands
+    if not isinstance(counter, IdentifierNode) or not node.scope.instructions:
+        return node
+
+    *body, increment = node.scope.instructions
+    if not isinstance(increment, IdentifierAssignmentNode):
+        return node
+    target, value = increment.chain_of_assignments
+    if target.name != counter.name or not isinstance(value, LeftPolyOperatorNode) or value.operators != [direction]:
+        return node
+    source, step = value.operands
+    if not isinstance(source, IdentifierNode) or source.name != counter.name:
+        return node
+    if not isinstance(step, NumberNode) or type(step.number) is not int or step.number <= 0:
+        return node
+
+    if not _is_invariant(stop, assigned_names(node)):
+        return node
+    if any(counter.name in assigned_names(instruction) for instruction in body):
+        return node
+
+    return RangeLoopNode(node.line, node.pos, node.condition, node.scope)
+
+
+def hoist_loop_invariants(tree: ASTRoot) -> ASTRoot:
+    """
+    Wrap the largest subexpressions of every loop which don't depend
+    on variables assigned in that loop, so they're evaluated once per loop run
+    """
+    if not isinstance(tree, ScopeNode):
+        return transform(tree, lambda node: _hoist(node, {}))
+
+    # calls of pure functions are invariant in the instructions following their declarations
+    declared = pure_functions(tree)
+    functions: Dict[str, Set[str]] = {}
+    for idx, instruction in enumerate(tree.instructions):
+        known = dict(functions)
+        tree.instructions[idx] = transform(instruction, lambda node: _hoist(node, known))
+
+        if isinstance(instruction, IdentifierAssignmentNode):
+            target, value = instruction.chain_of_assignments
+            called = declared.get(target.name)
+            if called is not None and called - {target.name} <= functions.keys():
+                reads = referenced_names(value.body) - {param.name for param in value.params}
+                for callee in called - {target.name}:
+                    reads |= functions[callee]
+                functions[target.name] = reads
+
+    tree.finalize()
+    return tree
+
+
+def _hoist(node: ASTRoot, functions: Dict[str, Set[str]]) -> ASTRoot:
+    if isinstance(node, WhileNode):
+        written = assigned_names(node)
+
+        def wrap(child: ASTRoot) -> ASTRoot:
+            if isinstance(child, (FunctionDeclarationNode, ClassDeclarationNode, InvariantNode)):
+                return child
+            if _is_invariant(child, written, functions) and not child.is_literal and not isinstance(child, IdentifierNode):
+                return node.cache_invariant(child, _invariant_reads(child, functions))
+            _replace_children(child, wrap)
+            return child
+
+        _replace_children(node, wrap)
+    return node
+
+
+def _invariant_reads(node: ASTRoot, functions: Dict[str, Set[str]]) -> Set[str]:
+    # names read by the node, including the ones read by the pure functions it calls
+    reads = referenced_names(node)
+    for name in reads & functions.keys():
+        reads = reads | functions[name]
+    return reads
+
+
+def pure_functions(tree: ScopeNode) -> Dict[str, Set[str]]:
+    """
+    Functions declared by the instructions of the program, e.g. f := function(x) x * k,
+    whose names aren't bound anywhere else and which only compute values.
+    Maps their names to the names of the functions they call.
+
+    After such a declaration is run, calls by its name with the same arguments
+    return the same result, as long as the variables the function reads are the same
+    and hold no lists or objects, which might be changed in place
+    """
+    bindings: Dict[str, int] = {}
+    pending = [tree]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, AssignmentNode):
+            targets = current.chain_of_assignments[:-1]
+        elif isinstance(current, (FunctionDeclarationNode, ClassDeclarationNode)):
+            targets = current.params
+        else:
+            targets = []
+        for target in targets:
+            for name in referenced_names(target):
+                bindings[name] = bindings.get(name, 0) + 1
+        pending.extend(current.children())
+
+    functions = {}
+    for instruction in tree.instructions:
+        if isinstance(instruction, IdentifierAssignmentNode):
+            target, value = instruction.chain_of_assignments
+            if isinstance(value, FunctionDeclarationNode) and bindings[target.name] == 1:
+                called = _pure_body_calls(value.body)
+                if called is not None:
+                    functions[target.name] = called
+    return functions
+
+
+def _pure_body_calls(body: ASTRoot) -> Optional[Set[str]]:
+    """
+    Names of the functions called in the body, if it only computes values.
+    Containers and members may be changed through other names, so reading them isn't allowed
+    """
+    called = set()
+    pending = [body]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, (FunctionDeclarationNode, ClassDeclarationNode)):
+            return None
+        if isinstance(current, OperatorNode):
+            if current.operator in ('$index', '$attr'):
+                return None
+            if current.operator == '$func':
+                callee = current.operands[0]
+                if len(current.operands) != 2 or not isinstance(callee, IdentifierNode):
+                    return None
+                called.add(callee.name)
+        elif isinstance(current, UnaryOperatorNode) and current.operator == '#':
+            return None
+        pending.extend(current.children())
+    return called
+
+
+def _is_invariant(node: ASTRoot, written: Set[str], functions: Optional[Dict[str, Set[str]]] = None) -> bool:
+    if isinstance(node, IdentifierNode):
+        return node.name not in written
+    if node.is_literal or isinstance(node, LazyConstantNode):
+        return True
+
+    # calls might have side effects, unless they're calls of pure functions,
+    # while containers might be changed through other names
+    if isinstance(node, OperatorNode):
+        if node.operator == '$func':
+            callee = node.operands[0]
+            if functions is None or len(node.operands) != 2 or not isinstance(callee, IdentifierNode):
+                return False
+            if callee.name not in functions or callee.name in written or functions[callee.name] & written:
+                return False
+            return all(_is_invariant(argument, written, functions) for argument in node.operands[1])
+        if node.operator in ('$index', '$attr'):
+            return False
+    elif isinstance(node, UnaryOperatorNode):
+        if node.operator == '#':
+            return False
+    elif not isinstance(node, (ComparisonNode, LeftPolyOperatorNode)):
+        return False
+
+    return all(_is_invariant(child, written, functions) for child in node.children())
@@ -3,457 +3,343 @@ from .ast import (
     IfElseNode, WhileNode, OperatorNode, ComparisonNode, BooleanNode, NullNode,
     LeftPolyOperatorNode, UnaryOperatorNode, FunctionDeclarationNode, EllipsisOperatorNode,
     NumberNode, ListNode, IdentifierNode, StringNode, ClassDeclarationNode, AssignmentNode,
-    ScopeNode
+    ScopeNode, SINGLE_COMPARISON_NODES,
+    IdentifierAssignmentNode, IndexAssignmentNode, MemberAssignmentNode, UnpackAssignmentNode
 )
 from .exceptions import DIStaticSyntaxError
-from .lexemes import Lexemes
+from .lexemes import (
+    Lexemes, STRING, FLOAT, INTEGER, BOOLEAN, NULL, COMMA, END_LINE, OPEN_SQUARE_BRACKET,
+    CLOSED_SQUARE_BRACKET, OPEN_BRACKET, CLOSED_BRACKET, OPEN_SCOPE, CLOSED_SCOPE, OP_ASSIGN,
+    OP_BITWISE_OR, OP_BITWISE_XOR, OP_BITWISE_AND, OP_LOGICAL, OP_COMPARISON, OP_BITWISE_SHIFT,
+    OP_ADDITIVE, OP_MULTIPLICATIVE, OP_POWER, OP_INDEX, OP_COALESCE, OP_ATTRIBUTE_ACCESS,
+    OP_ELLIPSIS, KEYWORD, IDENTIFIER, END_OF_FILE
+)
 from .lexer import Lexer
 
-from typing import NoReturn
+from typing import Callable, Dict, NoReturn
+
+# precedence levels of the operators, from the loosest binding; only 'not' is unary
+(
+    COALESCE, LOGICAL_OR, LOGICAL_AND, LOGICAL_NOT, COMPARISON, BITWISE_OR, BITWISE_XOR, BITWISE_AND,
+    SHIFT, ADDITIVE, MULTIPLICATIVE, POWER
+) = range(12)
+
+_LEVELS = {
+    OP_COALESCE: COALESCE,
+    OP_COMPARISON: COMPARISON,
+    OP_BITWISE_OR: BITWISE_OR,
+    OP_BITWISE_XOR: BITWISE_XOR,
+    OP_BITWISE_AND: BITWISE_AND,
+    OP_BITWISE_SHIFT: SHIFT,
+    OP_ADDITIVE: ADDITIVE,
+    OP_MULTIPLICATIVE: MULTIPLICATIVE,
+    OP_POWER: POWER,
+}
+
+# logical operators share one kind of token, so their level depends on the value
+_LOGICAL_LEVELS = {'or': LOGICAL_OR, 'and': LOGICAL_AND}
+
+# levels built into LeftPolyOperatorNode, as their operators may differ within a chain
+_POLY_LEVELS = (SHIFT, ADDITIVE, MULTIPLICATIVE)
 
 
 class Parser:
 
     def __init__(self, lexer: Lexer) -> None:
-        self.tokens = [lex for lex in lexer]
+        self.kinds, self.values, self.lines, self.chars = lexer.tokenize()
         self.i = 0
 
     def get_next(self) -> None:
         self.i += 1
 
-    def is_consumable(self, token_type: Lexemes, token_value: str | None = None) -> bool:
-        if self.curr_token is None:
+    def is_consumable(self, token_type: int, token_value: str | None = None) -> bool:
+        # tokens end with END_OF_FILE, which is consumed last, so the index is always in range
+        if self.kinds[self.i] != token_type:
             return False
 
-        if token_value is None:
-            return self.curr_token[0] == token_type
-
-        return self.curr_token[0:2] == (token_type, token_value)
+        return token_value is None or self.values[self.i] == token_value
 
-    def consume(self, token_type: Lexemes) -> str | int | float:
-        if self.curr_token is None or self.curr_token[0] != token_type:
-            self.error(f"Expected token mismatch: expected {token_type.name}, found {self.curr_token[0].name}")
-        val = self.curr_token[1]
-        self.get_next()
-        return val
+    def consume(self, token_type: int) -> tuple[str | int | float, int, int]:
+        """
+        Move past the current token of the given type, returning its value and location
+        """
+        i = self.i
+        if self.kinds[i] != token_type:
+            self.error(f"Expected token mismatch: expected {Lexemes(token_type).name}, found {Lexemes(self.curr_token[0]).name}")
+        self.i = i + 1
+        return self.values[i], self.lines[i], self.chars[i]
 
     def error(self, reason) -> NoReturn:
         pt = str(self.prev_token[1]) if self.prev_token else ''
         ct = str(self.curr_token[1]) if self.curr_token else ''
 
         _, _, line, char = self.curr_token
+        _, _, prev_line, prev_char = self.prev_token or (None, None, 0, -1)
         raise DIStaticSyntaxError(
-            self.line, self.pos,
+            prev_line, prev_char,
             f"\nParsing error: '{pt}' '{ct}'\n" +
             f" " * (len(pt) + 18) + " " + "^" * len(ct) +
             f"\nInvalid token found in line {line}, character {char}\n" +
             reason
         )
 
-    @property
-    def curr_token(self) -> None | tuple[Lexemes, str | int | float, int, int]:
-        return self.tokens[self.i] if self.i < len(self.tokens) else None
-
-    @property
-    def prev_token(self) -> None | tuple[Lexemes, str | int | float, int, int]:
-        return self.tokens[self.i - 1] if 1 < self.i <= len(self.tokens) else None
+    def token(self, index: int) -> tuple[int, str | int | float, int, int]:
+        return self.kinds[index], self.values[index], self.lines[index], self.chars[index]
 
     @property
-    def line(self):
-        return self.prev_token[2] if self.prev_token else 0
+    def curr_token(self) -> None | tuple[int, str | int | float, int, int]:
+        return self.token(self.i) if self.i < len(self.kinds) else None
 
     @property
-    def pos(self):
-        return self.prev_token[3] if self.prev_token else -1
+    def prev_token(self) -> None | tuple[int, str | int | float, int, int]:
+        return self.token(self.i - 1) if 1 < self.i <= len(self.kinds) else None
 
     def parse_program(self) -> ScopeNode:
         scope_node = ScopeNode(0, 0)
 
-        while not self.is_consumable(Lexemes.END_OF_FILE):
+        while not self.is_consumable(END_OF_FILE):
             scope_node.instructions.append(self.parse_expression())
 
-        self.consume(Lexemes.END_OF_FILE)
+        self.consume(END_OF_FILE)
 
+        scope_node.finalize()
         return scope_node
 
-    def parse_expression(self) -> ASTRoot:
-
-        while self.is_consumable(Lexemes.END_LINE):
-            self.consume(Lexemes.END_LINE)
+    def _skip_newlines(self) -> None:
+        kinds = self.kinds
+        i = self.i
+        while kinds[i] == END_LINE:
+            i += 1
+        self.i = i
 
+    def parse_expression(self) -> ASTRoot:
+        self._skip_newlines()
         value: ASTRoot = self.parse_assignment()
-        while self.is_consumable(Lexemes.END_LINE):
-            self.consume(Lexemes.END_LINE)
+        self._skip_newlines()
         return value
 
     def parse_assignment(self) -> OperatorNode | ASTRoot:
-        operand = self.parse_coalesce()
-        if not self.is_consumable(Lexemes.OP_ASSIGN):
+        operand = self.parse_binary()
+        if not self.is_consumable(OP_ASSIGN):
             return operand
 
         operands = [operand]
         lasts = []
 
-        while self.is_consumable(Lexemes.OP_ASSIGN):
-            lasts.append(self.consume(Lexemes.OP_ASSIGN) == '=:')
-            operands.append(self.parse_coalesce())
-
+        while self.is_consumable(OP_ASSIGN):
+            symbol, _, _ = self.consume(OP_ASSIGN)
+            lasts.append(symbol == '=:')
+            operands.append(self.parse_binary())
+
+        if len(operands) == 2 and not lasts[0]:
+            if isinstance(operand, IdentifierNode):
+                return IdentifierAssignmentNode(operand.line, operand.pos, operands, lasts)
+            if isinstance(operand, OperatorNode) and operand.operator == '$index' and all(operand.operands[1:]):
+                return IndexAssignmentNode(operand.line, operand.pos, operands, lasts)
+            if isinstance(operand, OperatorNode) and operand.operator == '$attr':
+                return MemberAssignmentNode(operand.line, operand.pos, operands, lasts)
+            if isinstance(operand, ListNode) and all(isinstance(element, IdentifierNode) for element in operand):
+                return UnpackAssignmentNode(operand.line, operand.pos, operands, lasts)
         return AssignmentNode(operand.line, operand.pos, operands, lasts)
 
-    def parse_coalesce(self) -> OperatorNode | ASTRoot:
-        left_expr = self.parse_logical_or()
-        if not self.is_consumable(Lexemes.OP_COALESCE):
-            return left_expr
-
-        operands = [left_expr]
-        while self.is_consumable(Lexemes.OP_COALESCE):
-            self.consume(Lexemes.OP_COALESCE)
-            operands.append(self.parse_logical_or())
-        return OperatorNode(left_expr.line, left_expr.pos, '?', operands)
-
-    def parse_logical_or(self) -> OperatorNode | ASTRoot:
-
-        left_expr = self.parse_logical_and()
-        if not self.is_consumable(Lexemes.OP_LOGICAL, 'or'):
-            return left_expr
-
-        operands = [left_expr]
-        while self.is_consumable(Lexemes.OP_LOGICAL, 'or'):
-            self.consume(Lexemes.OP_LOGICAL)
-            operands.append(self.parse_logical_and())
-        return OperatorNode(left_expr.line, left_expr.pos, 'or', operands)
-
-    def parse_logical_and(self) -> OperatorNode | ASTRoot:
-        left_expr = self.parse_logical_not()
-        if not self.is_consumable(Lexemes.OP_LOGICAL, 'and'):
-            return left_expr
-
-        operands = [left_expr]
-        while self.is_consumable(Lexemes.OP_LOGICAL, 'and'):
-            self.consume(Lexemes.OP_LOGICAL)
-            operands.append(self.parse_logical_not())
-
-        return OperatorNode(left_expr.line, left_expr.pos, 'and', operands)
-
-    def parse_logical_not(self) -> UnaryOperatorNode | ASTRoot:
-        if self.is_consumable(Lexemes.OP_LOGICAL, 'not'):
-            self.consume(Lexemes.OP_LOGICAL)
-            return UnaryOperatorNode(self.line, self.pos, 'not', self.parse_comparison())
-
+    def parse_binary(self, min_level: int = COALESCE) -> ASTRoot:
+        """
+        Precedence climbing over the binary operators, starting from the level min_level.
+        The operators of one level form a single flat node, as all of them are left-associative
+        except '**', which is evaluated right to left by its node
+        """
+        if min_level <= LOGICAL_NOT and self.is_consumable(OP_LOGICAL, 'not'):
+            operand = self.parse_logical_not()
         else:
-            return self.parse_comparison()
-
-    def parse_comparison(self) -> LeftPolyOperatorNode | ASTRoot:
-
-        operand = self.parse_bitwise_or()
-        if not self.is_consumable(Lexemes.OP_COMPARISON):
-            return operand
-
-        operands = [operand]
-        operators = []
-
-        while self.is_consumable(Lexemes.OP_COMPARISON):
-            operators.append(self.consume(Lexemes.OP_COMPARISON))
-            operands.append(self.parse_bitwise_or())
-
-        return ComparisonNode(operand.line, operand.pos, operators, operands)
-
-    def parse_bitwise_or(self) -> OperatorNode | ASTRoot:
-
-        operand = self.parse_bitwise_xor()
-        if not self.is_consumable(Lexemes.OP_BITWISE_OR):
-            return operand
-
-        operands = [operand]
-
-        while self.is_consumable(Lexemes.OP_BITWISE_OR):
-            self.consume(Lexemes.OP_BITWISE_OR)
-            operands.append(self.parse_bitwise_xor())
-
-        return OperatorNode(operand.line, operand.pos, '|', operands)
-
-    def parse_bitwise_xor(self) -> OperatorNode | ASTRoot:
-
-        operand = self.parse_bitwise_and()
-        if not self.is_consumable(Lexemes.OP_BITWISE_XOR):
-            return operand
-
-        operands = [operand]
-
-        while self.is_consumable(Lexemes.OP_BITWISE_XOR):
-            self.consume(Lexemes.OP_BITWISE_XOR)
-            operands.append(self.parse_bitwise_and())
-
-        return OperatorNode(operand.line, operand.pos, '^', operands)
-
-    def parse_bitwise_and(self) -> OperatorNode | ASTRoot:
-
-        operand = self.parse_bitwise_shifts()
-        if not self.is_consumable(Lexemes.OP_BITWISE_AND):
-            return operand
-
-        operands = [operand]
-
-        while self.is_consumable(Lexemes.OP_BITWISE_AND):
-            self.consume(Lexemes.OP_BITWISE_AND)
-            operands.append(self.parse_bitwise_shifts())
-
-        return OperatorNode(operand.line, operand.pos, '|', operands)
-
-    def parse_bitwise_shifts(self) -> LeftPolyOperatorNode | ASTRoot:
-
-        operand = self.parse_additive()
-        if not self.is_consumable(Lexemes.OP_BITWISE_SHIFT):
-            return operand
-
-        operands = [operand]
-        operators = []
-
-        while self.is_consumable(Lexemes.OP_BITWISE_SHIFT):
-            operators.append(self.consume(Lexemes.OP_BITWISE_SHIFT))
-            operands.append(self.parse_additive())
-
-        return LeftPolyOperatorNode(operand.line, operand.pos, operators, operands)
-
-    def parse_additive(self) -> LeftPolyOperatorNode | ASTRoot:
-
-        operand = self.parse_multiplicative()
-        if not self.is_consumable(Lexemes.OP_ADDITIVE):
-            return operand
-
-        operands = [operand]
-        operators = []
-
-        while self.is_consumable(Lexemes.OP_ADDITIVE):
-            operators.append(self.consume(Lexemes.OP_ADDITIVE))
-            operands.append(self.parse_multiplicative())
-
-        return LeftPolyOperatorNode(operand.line, operand.pos, operators, operands)
-
-    def parse_multiplicative(self) -> LeftPolyOperatorNode | ASTRoot:
-
-        operand = self.parse_power()
-        if not self.is_consumable(Lexemes.OP_MULTIPLICATIVE):
-            return operand
-
-        operands = [operand]
-        operators = []
-
-        while self.is_consumable(Lexemes.OP_MULTIPLICATIVE):
-            operators.append(self.consume(Lexemes.OP_MULTIPLICATIVE))
-            operands.append(self.parse_power())
-
-        return LeftPolyOperatorNode(operand.line, operand.pos, operators, operands)
-
-    def parse_power(self) -> OperatorNode | ASTRoot:
-        operand = self.parse_unary()
-        if not self.is_consumable(Lexemes.OP_POWER):
-            return operand
-
-        operands = [operand]
-
-        while self.is_consumable(Lexemes.OP_POWER):
-            _ = self.consume(Lexemes.OP_POWER)
-            operands.append(self.parse_unary())
-
-        return OperatorNode(operand.line, operand.pos, '**', operands)
+            operand = self.parse_unary()
+
+        kinds = self.kinds
+        while True:
+            kind = kinds[self.i]
+            level = _LOGICAL_LEVELS.get(self.values[self.i]) if kind == OP_LOGICAL else _LEVELS.get(kind)
+            if level is None or level < min_level:
+                return operand
+
+            operands = [operand]
+            operators = []
+            while True:
+                symbol, _, _ = self.consume(kind)
+                operators.append(symbol)
+                operands.append(self.parse_binary(level + 1))
+                if kinds[self.i] != kind or kind == OP_LOGICAL and self.values[self.i] != operators[0]:
+                    break
+
+            if level == COMPARISON:
+                if len(operators) == 1:
+                    operand = SINGLE_COMPARISON_NODES[operators[0]](operand.line, operand.pos, operators, operands)
+                else:
+                    operand = ComparisonNode(operand.line, operand.pos, operators, operands)
+            elif level in _POLY_LEVELS:
+                operand = LeftPolyOperatorNode(operand.line, operand.pos, operators, operands)
+            else:
+                operand = OperatorNode(operand.line, operand.pos, operators[0], operands)
+
+    def parse_logical_not(self) -> UnaryOperatorNode:
+        _, line, pos = self.consume(OP_LOGICAL)
+        return UnaryOperatorNode(line, pos, 'not', self.parse_binary(COMPARISON))
 
     def parse_unary(self) -> UnaryOperatorNode | ASTRoot:
-        if self.is_consumable(Lexemes.OP_ADDITIVE):
-            op = self.consume(Lexemes.OP_ADDITIVE)
-            return UnaryOperatorNode(self.line, self.pos, op, self.parse_function_call())
-        elif self.is_consumable(Lexemes.OP_INDEX):
-            op = self.consume(Lexemes.OP_INDEX)
-            return UnaryOperatorNode(self.line, self.pos, op, self.parse_function_call())
-        elif self.is_consumable(Lexemes.OP_ELLIPSIS):
-            self.consume(Lexemes.OP_ELLIPSIS)
-            return EllipsisOperatorNode(self.line, self.pos, self.parse_function_call())
+        if self.is_consumable(OP_ADDITIVE):
+            op, line, pos = self.consume(OP_ADDITIVE)
+            return UnaryOperatorNode(line, pos, op, self.parse_function_call())
+        elif self.is_consumable(OP_INDEX):
+            op, line, pos = self.consume(OP_INDEX)
+            return UnaryOperatorNode(line, pos, op, self.parse_function_call())
+        elif self.is_consumable(OP_ELLIPSIS):
+            _, line, pos = self.consume(OP_ELLIPSIS)
+            return EllipsisOperatorNode(line, pos, self.parse_function_call())
         else:
             return self.parse_function_call()
 
-    def _parse_comma_separated_args(self, opening: Lexemes, closing: Lexemes) -> list[ASTRoot]:
+    def _parse_comma_separated(self, closing: int, parse_item: Callable[[], ASTRoot]) -> list[ASTRoot]:
+        # the opening bracket is consumed by the caller
         res = []
-        self.consume(opening)
         while not self.is_consumable(closing):
-            res.append(self.parse_expression())
+            res.append(parse_item())
             if self.is_consumable(closing):
                 break
 
-            self.consume(Lexemes.COMMA)
-            while self.is_consumable(Lexemes.END_LINE):
-                self.consume(Lexemes.END_LINE)
+            self.consume(COMMA)
+            self._skip_newlines()
         self.consume(closing)
         return res
 
     def parse_function_call(self) -> OperatorNode | ASTRoot:
         operand = self.parse_indexation()
-        if not self.is_consumable(Lexemes.OPEN_BRACKET):
+        if not self.is_consumable(OPEN_BRACKET):
             return operand
 
         chain_of_args = [operand]
-        while self.is_consumable(Lexemes.OPEN_BRACKET):
-            chain_of_args.append(self._parse_comma_separated_args(Lexemes.OPEN_BRACKET, Lexemes.CLOSED_BRACKET))
+        while self.is_consumable(OPEN_BRACKET):
+            self.consume(OPEN_BRACKET)
+            chain_of_args.append(self._parse_comma_separated(CLOSED_BRACKET, self.parse_expression))
 
         return OperatorNode(operand.line, operand.pos, '$func', chain_of_args)
 
     def parse_indexation(self) -> OperatorNode | ASTRoot:
 
         operand = self.parse_member_access()
-        if not self.is_consumable(Lexemes.OPEN_SQUARE_BRACKET):
+        if not self.is_consumable(OPEN_SQUARE_BRACKET):
             return operand
 
         chain_of_args = [operand]
 
-        while self.is_consumable(Lexemes.OPEN_SQUARE_BRACKET):
-            chain_of_args.append(
-                self._parse_comma_separated_args(Lexemes.OPEN_SQUARE_BRACKET, Lexemes.CLOSED_SQUARE_BRACKET)
-            )
+        while self.is_consumable(OPEN_SQUARE_BRACKET):
+            self.consume(OPEN_SQUARE_BRACKET)
+            chain_of_args.append(self._parse_comma_separated(CLOSED_SQUARE_BRACKET, self.parse_expression))
 
         return OperatorNode(operand.line, operand.pos, '$index', chain_of_args)
 
     def parse_member_access(self) -> OperatorNode | ASTRoot:
 
         operand = self.parse_primary()
-        if not self.is_consumable(Lexemes.OP_ATTRIBUTE_ACCESS):
+        if not self.is_consumable(OP_ATTRIBUTE_ACCESS):
             return operand
 
         chain_of_args = [operand]
 
         line, pos = None, None
-        while self.is_consumable(Lexemes.OP_ATTRIBUTE_ACCESS):
-            self.consume(Lexemes.OP_ATTRIBUTE_ACCESS)
-            line, pos = self.line, self.pos
-
-            member = IdentifierNode(
-                name=self.consume(Lexemes.IDENTIFIER),
-                line=self.line, pos=self.pos
-            )
-            chain_of_args.append(member)
+        while self.is_consumable(OP_ATTRIBUTE_ACCESS):
+            _, line, pos = self.consume(OP_ATTRIBUTE_ACCESS)
+            chain_of_args.append(self.parse_identifier())
 
         return OperatorNode(line, pos, '$attr', chain_of_args)
 
     def parse_primary(self) -> ASTRoot:
+        i = self.i
+        kind = self.kinds[i]
+
+        # names and numbers are most of the operands, so they are built right here
+        if kind == IDENTIFIER:
+            self.i = i + 1
+            return IdentifierNode(self.lines[i], self.chars[i], self.values[i])
+        if kind == INTEGER or kind == FLOAT:
+            self.i = i + 1
+            return NumberNode(self.lines[i], self.chars[i], self.values[i])
+
+        if kind == KEYWORD:
+            parse = self._KEYWORD_PARSERS.get(self.values[i])
+        else:
+            parse = self._PRIMARY_PARSERS.get(kind)
 
-        if self.is_consumable(Lexemes.INTEGER):
-            # note: kwargs order is important
-            sub_result = NumberNode(
-                number=self.consume(Lexemes.INTEGER),
-                line=self.line, pos=self.pos
-            )
-
-        elif self.is_consumable(Lexemes.FLOAT):
-            # note: kwargs order is important
-            sub_result = NumberNode(
-                number=self.consume(Lexemes.FLOAT),
-                line=self.line, pos=self.pos
-            )
-
-        elif self.is_consumable(Lexemes.STRING):
-            # note: kwargs order is important
-            sub_result = StringNode(
-                string=self.consume(Lexemes.STRING),
-                line=self.line, pos=self.pos
-            )
-
-        elif self.is_consumable(Lexemes.BOOLEAN):
-            # note: kwargs order is important
-            sub_result = BooleanNode(
-                value=self.consume(Lexemes.NUMBER),
-                line=self.line, pos=self.pos
-            )
-
-        elif self.is_consumable(Lexemes.NULL):
-            self.consume(Lexemes.NULL)
-            sub_result = NullNode(self.line, self.pos)
-
-        elif self.is_consumable(Lexemes.OPEN_SQUARE_BRACKET):
-            sub_result = self.parse_list()
-
-        elif self.is_consumable(Lexemes.OPEN_BRACKET):
-            self.consume(Lexemes.OPEN_BRACKET)
-            sub_result = self.parse_expression()
-            self.consume(Lexemes.CLOSED_BRACKET)
-
-        elif self.is_consumable(Lexemes.IDENTIFIER):
-            # note: kwargs order is important
-            sub_result = IdentifierNode(
-                name=self.consume(Lexemes.IDENTIFIER),
-                line=self.line, pos=self.pos
-            )
-
-        elif self.is_consumable(Lexemes.OPEN_SCOPE):
-            sub_result = self.parse_scope()
-
-        elif self.is_consumable(Lexemes.KEYWORD, 'if'):
-            sub_result = self.parse_if()
-
-        elif self.is_consumable(Lexemes.KEYWORD, 'while'):
-            sub_result = self.parse_while()
-
-        elif self.is_consumable(Lexemes.KEYWORD, 'function'):
-            sub_result = self.parse_function()
-
-        elif self.is_consumable(Lexemes.KEYWORD, 'class'):
-            sub_result = self.parse_class()
+        if parse is None:
+            self.error(f"Invalid terminal type: {Lexemes(kind).name}")
+        return parse(self)
 
-        else:
-            self.error(f"Invalid terminal type: {self.curr_token[0].name}")
+    def parse_number(self) -> NumberNode:
+        number, line, pos = self.consume(self.kinds[self.i])
+        return NumberNode(line, pos, number)
 
-        return sub_result
+    def parse_string(self) -> StringNode:
+        string, line, pos = self.consume(STRING)
+        return StringNode(line, pos, string)
 
-    def parse_list(self) -> ListNode:
+    def parse_boolean(self) -> BooleanNode:
+        value, line, pos = self.consume(BOOLEAN)
+        return BooleanNode(line, pos, value)
 
-        res = []
+    def parse_null(self) -> NullNode:
+        _, line, pos = self.consume(NULL)
+        return NullNode(line, pos)
 
-        self.consume(Lexemes.OPEN_SQUARE_BRACKET)
-        line, pos = self.line, self.pos
-        while not self.is_consumable(Lexemes.CLOSED_SQUARE_BRACKET):
-            res.append(self.parse_expression())
-            if self.is_consumable(Lexemes.CLOSED_SQUARE_BRACKET):
-                break
+    def parse_parenthesized(self) -> ASTRoot:
+        self.consume(OPEN_BRACKET)
+        sub_result = self.parse_expression()
+        self.consume(CLOSED_BRACKET)
+        return sub_result
+
+    def parse_identifier(self) -> IdentifierNode:
+        name, line, pos = self.consume(IDENTIFIER)
+        return IdentifierNode(line, pos, name)
+
+    def parse_list(self) -> ListNode:
 
-            _ = self.consume(Lexemes.COMMA)
-            while self.is_consumable(Lexemes.END_LINE):
-                self.consume(Lexemes.END_LINE)
-        self.consume(Lexemes.CLOSED_SQUARE_BRACKET)
-        return ListNode(line, pos, res)
+        _, line, pos = self.consume(OPEN_SQUARE_BRACKET)
+        return ListNode(line, pos, self._parse_comma_separated(CLOSED_SQUARE_BRACKET, self.parse_expression))
 
     def parse_scope(self) -> ScopeNode:
 
-        if not self.is_consumable(Lexemes.OPEN_SCOPE):
+        if not self.is_consumable(OPEN_SCOPE):
             instruction = self.parse_expression()
             scope_node = ScopeNode(instruction.line, instruction.pos)
             scope_node.instructions.append(instruction)
+            scope_node.finalize()
             return scope_node
 
-        self.consume(Lexemes.OPEN_SCOPE)
-        scope_node = ScopeNode(self.line, self.pos)
-        while not self.is_consumable(Lexemes.CLOSED_SCOPE):
+        _, line, pos = self.consume(OPEN_SCOPE)
+        scope_node = ScopeNode(line, pos)
+        while not self.is_consumable(CLOSED_SCOPE):
             scope_node.instructions.append(self.parse_expression())
-        self.consume(Lexemes.CLOSED_SCOPE)
+        self.consume(CLOSED_SCOPE)
 
+        scope_node.finalize()
         return scope_node
 
     def parse_if(self) -> IfElseNode:
 
-        _ = self.consume(Lexemes.KEYWORD)
-
-        if_else_node = IfElseNode(self.line, self.pos)
+        _, line, pos = self.consume(KEYWORD)
+        if_else_node = IfElseNode(line, pos)
         if_else_node.add_branch(self.parse_condition(), self.parse_scope())
 
-        while self.is_consumable(Lexemes.KEYWORD, 'elif'):
-            _ = self.consume(Lexemes.KEYWORD)
+        while self.is_consumable(KEYWORD, 'elif'):
+            _ = self.consume(KEYWORD)
             if_else_node.add_branch(self.parse_condition(), self.parse_scope())
 
-        if self.is_consumable(Lexemes.KEYWORD, 'else'):
-            self.consume(Lexemes.KEYWORD)
+        if self.is_consumable(KEYWORD, 'else'):
+            self.consume(KEYWORD)
             if_else_node.add_branch(None, self.parse_scope())
 
+        if_else_node.finalize()
         return if_else_node
 
     def parse_while(self) -> WhileNode:
-        self.consume(Lexemes.KEYWORD)
-        return WhileNode(self.line, self.pos, self.parse_condition(), self.parse_scope())
+        _, line, pos = self.consume(KEYWORD)
+        return WhileNode(line, pos, self.parse_condition(), self.parse_scope())
 
     def parse_class(self) -> ClassDeclarationNode:
         """
@@ -475,50 +361,39 @@ class Parser:
         :return:
         """
 
-        params = []
-        self.consume(Lexemes.KEYWORD)
-        self.consume(Lexemes.OPEN_BRACKET)
-        while not self.is_consumable(Lexemes.CLOSED_BRACKET):
-            params.append(
-                IdentifierNode(
-                    name=self.consume(Lexemes.IDENTIFIER),
-                    line=self.line, pos=self.pos  # Intentional code design: firstly consume, then get location
-                )
-            )
-            if self.is_consumable(Lexemes.CLOSED_BRACKET):
-                break
-
-            _ = self.consume(Lexemes.COMMA)
-            while self.is_consumable(Lexemes.END_LINE):
-                self.consume(Lexemes.END_LINE)
-        self.consume(Lexemes.CLOSED_BRACKET)
-        return ClassDeclarationNode(self.line, self.pos, params, self.parse_scope())
+        _, line, pos = self.consume(KEYWORD)
+        self.consume(OPEN_BRACKET)
+        params = self._parse_comma_separated(CLOSED_BRACKET, self.parse_identifier)
+        return ClassDeclarationNode(line, pos, params, self.parse_scope())
 
     def parse_function(self) -> FunctionDeclarationNode:
 
-        _ = self.consume(Lexemes.KEYWORD)
-        line, pos = self.line, self.pos
-        params = []
-
-        self.consume(Lexemes.OPEN_BRACKET)
-        while not self.is_consumable(Lexemes.CLOSED_BRACKET):
-            params.append(
-                IdentifierNode(
-                    name=self.consume(Lexemes.IDENTIFIER),
-                    line=self.line, pos=self.pos  # Intentional code design: firstly consume, then get location
-                )
-            )
-            if self.is_consumable(Lexemes.CLOSED_BRACKET):
-                break
-
-            _ = self.consume(Lexemes.COMMA)
-            while self.is_consumable(Lexemes.END_LINE):
-                self.consume(Lexemes.END_LINE)
-        self.consume(Lexemes.CLOSED_BRACKET)
+        _, line, pos = self.consume(KEYWORD)
+        self.consume(OPEN_BRACKET)
+        params = self._parse_comma_separated(CLOSED_BRACKET, self.parse_identifier)
         return FunctionDeclarationNode(line, pos, params, self.parse_scope())
 
     def parse_condition(self) -> ASTRoot:
-        self.consume(Lexemes.OPEN_BRACKET)
-        result: ASTRoot = self.parse_logical_or()
-        self.consume(Lexemes.CLOSED_BRACKET)
+        self.consume(OPEN_BRACKET)
+        result: ASTRoot = self.parse_binary(LOGICAL_OR)
+        self.consume(CLOSED_BRACKET)
         return result
+
+    _PRIMARY_PARSERS: Dict[int, Callable[["Parser"], ASTRoot]] = {
+        IDENTIFIER: parse_identifier,
+        INTEGER: parse_number,
+        FLOAT: parse_number,
+        STRING: parse_string,
+        BOOLEAN: parse_boolean,
+        NULL: parse_null,
+        OPEN_SQUARE_BRACKET: parse_list,
+        OPEN_BRACKET: parse_parenthesized,
+        OPEN_SCOPE: parse_scope,
+    }
+
+    _KEYWORD_PARSERS: Dict[str, Callable[["Parser"], ASTRoot]] = {
+        'if': parse_if,
+        'while': parse_while,
+        'function': parse_function,
+        'class': parse_class,
+    }
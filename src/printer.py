@@ -1,4 +1,4 @@
-from typing import Union, List, Optional, LiteralString
+from typing import Union, List, LiteralString, Tuple, Any, Iterator
 from .ast import ASTRoot
 
 
@@ -10,37 +10,43 @@ class TreePrinter:
     _GOING: LiteralString = '│   '
 
     @classmethod
-    def print_tree(
-            cls,
-            tree: Union["ASTRoot", List["ASTRoot"]],
-            indent: str = "",
-            last: Optional[bool] = None,
-    ) -> str:
-        if not isinstance(tree, (ASTRoot, list)):
-            return str(tree) + "\n"
-
-        if last is not None:
-            indent += (cls._EMPTY if last else cls._GOING)
-
-        if isinstance(tree, list):
-
-            arg_num = len(tree)
-            result_string = "\n"
-            for index, item in enumerate(tree):
-                marker = cls._LAST_VAR if index == arg_num - 1 else cls._MIDDLE_VAR
-
-                substr = cls.print_tree(item, indent, index == arg_num - 1)
-                result_string += f"{indent}{marker}{substr}"
-
-            return result_string
-
-        res = repr(tree) + '\n'
-
-        attrs = tree.__dict__.copy()
-        arg_num = len(attrs)
-        for index, (arg_name, arg_value) in enumerate(attrs.items()):
-            arg_name = arg_name.lstrip("_")
-            marker = cls._LAST_VAR if index == arg_num - 1 else cls._MIDDLE_VAR
-            substr = cls.print_tree(arg_value, indent, index == arg_num - 1)
-            res += f"{indent}{marker}{arg_name}: {substr}"
-        return res
+    def print_tree(cls, tree: Union["ASTRoot", List["ASTRoot"]]) -> str:
+        parts: List[str] = []
+        # (value, indentation of its children, text before the value on its line)
+        pending: List[Tuple[Any, str, str]] = [(tree, "", "")]
+        while pending:
+            value, indent, head = pending.pop()
+            parts.append(head)
+
+            if isinstance(value, list):
+                parts.append("\n")
+                items = [("", item) for item in value]
+            elif isinstance(value, ASTRoot):
+                parts.append(f"{value!r}\n")
+                # skip evaluation caches and pre-bound handlers
+                items = [
+                    (f"{name}: ", attr) for name, attr in cls._attributes(value)
+                    if not name.startswith("_") and not callable(attr)
+                ]
+            else:
+                parts.append(f"{value}\n")
+                continue
+
+            # pushed in reverse, so that they're popped in order
+            last_index = len(items) - 1
+            for index in range(last_index, -1, -1):
+                label, item = items[index]
+                last = index == last_index
+                marker = cls._LAST_VAR if last else cls._MIDDLE_VAR
+                pending.append((item, indent + (cls._EMPTY if last else cls._GOING), f"{indent}{marker}{label}"))
+
+        return ''.join(parts)
+
+    @staticmethod
+    def _attributes(node: ASTRoot) -> Iterator[Tuple[str, Any]]:
+        # slots of the base classes first, in the order they're assigned in constructors
+        for klass in reversed(type(node).__mro__):
+            for name in klass.__dict__.get('__slots__', ()):
+                if hasattr(node, name):
+                    yield name, getattr(node, name)
+        yield from getattr(node, '__dict__', {}).items()
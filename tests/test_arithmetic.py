@@ -16,6 +16,7 @@ class TestArithmetic:
             ("0.25 + 0.33", 0.25 + 0.33),
             ("0b1001011 + 0b10001", 0b1011100),
             ("1 + 1 + 1 + 1 + 1 + 1 + 1 + 1 + 1 + 1", 10),
+            ("1e3 + 2.5E-1 + 0q10 + 0o10 + 0x1F", 1043.25),
         ]
         for idx, (formula, expected) in enumerate(formulae_and_expected):
             actual_value = self.interpreter.execute(formula)
@@ -34,6 +35,18 @@ class TestArithmetic:
             actual_value = self.interpreter.execute(formula)
             assert actual_value == expected, f"test #{idx} failed"
 
+    def test_unary_plus(self):
+        formulae_and_expected = [
+            ("+\"a\"", "a"),
+            ("x := [1]; +x", [1]),
+            ("-2 + +0.5", -1.5),
+        ]
+        for idx, (formula, expected) in enumerate(formulae_and_expected):
+            actual_value = self.interpreter.execute(formula)
+            assert actual_value == expected, f"test #{idx} failed"
+
+        assert self.interpreter.execute("+true") is True
+
     def test_len_operator_on_list(self):
         formulae_and_expected = [
             ("a := [1, 2, 3, 4, 5, 5, 6, 7]; #a", 8),
@@ -59,3 +72,67 @@ class TestArithmetic:
         for idx, (formula, expected) in enumerate(formulae_and_expected):
             actual_value = self.interpreter.execute(formula)
             assert actual_value == expected, f"test #{idx} failed"
+
+    def test_chained_comparison(self):
+        formulae_and_expected = [
+            ("1 < 2 < 3 <= 3", True),
+            ("1 < 3 < 2", False),
+            ("calls := 0; [0 < (calls := calls + 1) < 5, calls]", [True, 1]),
+            ("n := 0; [3 < 2 < (n := 1), n]", [False, 0]),
+        ]
+        for idx, (formula, expected) in enumerate(formulae_and_expected):
+            actual_value = self.interpreter.execute(formula)
+            assert actual_value == expected, f"test #{idx} failed"
+
+    def test_boolean_literals(self):
+        formulae_and_expected = [
+            ("true and not false", True),
+            ("[true, false, null ? 1]", [True, False, 1]),
+            ("if (false) 1 else 2", 2),
+        ]
+        for idx, (formula, expected) in enumerate(formulae_and_expected):
+            actual_value = self.interpreter.execute(formula)
+            assert actual_value == expected, f"test #{idx} failed"
+
+    def test_equality_branches(self):
+        formulae_and_expected = [
+            ("x := 2; if (x == 1) 10 elif (x == 2) 20 elif (x == 2) 30 else 40", 20),
+            ("x := 2.0; if (x == 1) 10 elif (x == 2) 20 else 40", 20),
+            ("x := [2]; if (x == 1) 10 elif (x == 2) 20 else 40", 40),
+            ("x := \"b\"; if (x == \"a\") 10 elif (x == \"b\") 20", 20),
+            ("x := null; if (x == 0) 10 elif (x == null) 20", 20),
+            ("x := 5; if (x == 1) 10 elif (x == 2) 20", None),
+        ]
+        for idx, (formula, expected) in enumerate(formulae_and_expected):
+            actual_value = self.interpreter.execute(formula)
+            assert actual_value == expected, f"test #{idx} failed"
+
+    def test_comments_and_whitespace(self):
+        formulae_and_expected = [
+            ("1 \\* multiline\n comment *\\ + 2", 3),
+            ("1 +\t## inline comment\n 2 ## at the end", 3),
+        ]
+        for idx, (formula, expected) in enumerate(formulae_and_expected):
+            actual_value = self.interpreter.execute(formula)
+            assert actual_value == expected, f"test #{idx} failed"
+
+    def test_bitwise_shifts(self):
+        formulae_and_expected = [
+            ("1 << 3", 8),
+            ("x := 64; x >> 2 >> 1", 8),
+            ("x := 0", 0),
+        ]
+        for idx, (formula, expected) in enumerate(formulae_and_expected):
+            actual_value = self.interpreter.execute(formula)
+            assert actual_value == expected, f"test #{idx} failed"
+
+    def test_bitwise_operators(self):
+        formulae_and_expected = [
+            ("6 & 3", 2),
+            ("6 | 3", 7),
+            ("6 ^ 3", 5),
+            ("[6 & 3 | 8, 1 ^ 3 & 1]", [10, 0]),
+        ]
+        for idx, (formula, expected) in enumerate(formulae_and_expected):
+            actual_value = self.interpreter.execute(formula)
+            assert actual_value == expected, f"test #{idx} failed"
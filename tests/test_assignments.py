@@ -1,5 +1,6 @@
 import pytest
 
+from src.exceptions import DIRuntimeSyntaxError
 from src.interpreter import MiniInterpreter
 
 
@@ -23,12 +24,24 @@ class TestAssignment:
         formulae_and_expected = [
             ("[a, b, c] := [1, 2, 3]; a + b * c", 7),
             ("[a, b, c, d, e] := [1, 4, 9, 16, 25]; e - d - c + b - a", 3),
-            ("[a, b] := \"cd\"; a", "c")
+            ("[a, b] := \"cd\"; a", "c"),
+            ("a := 1; b := 2; [a, b] := [b, a]; [a, b]", [2, 1]),
+            ("[a, a] := [1, 2]; a", 2),
         ]
         for idx, (formula, expected) in enumerate(formulae_and_expected):
             actual_value = self.interpreter.execute(formula)
             assert actual_value == expected, f"test #{idx} failed"
 
+    def test_list_assignment_errors(self):
+        codes = [
+            "[a, b] := [1, 2, 3]",
+            "[a, b] := [1]",
+            "[a, b] := 1",
+        ]
+        for code in codes:
+            with pytest.raises(DIRuntimeSyntaxError):
+                self.interpreter.execute(code)
+
     def test_nested_listic_assignment(self):
         code = """
             aa := [1, 1, 2, 3, 4, 5, 2, 3]
@@ -39,3 +52,29 @@ class TestAssignment:
 
         actual_value = self.interpreter.execute(code)
         assert actual_value == expected
+
+    def test_element_and_member_assignment(self):
+        formulae_and_expected = [
+            ("a := [1, 2, 3]; a[1] := 5; a", [1, 5, 3]),
+            ("a := [[1, 2], [3, 4]]; a[1][0] := 5; a", [[1, 2], [5, 4]]),
+            ("a := [[1, 2], [3, 4]]; a[0, 1] := 5; a", [[1, 5], [3, 4]]),
+            ("P := class (x) {}; p := P(1); p.x := p.x + 1; p.x", 2),
+            ("a := []; i := 0; while (i < 2) { b := [1, 2]; b[i] := 0; a := [...a, b]; i := i + 1 }; a",
+             [[0, 2], [1, 0]]),
+        ]
+        for idx, (formula, expected) in enumerate(formulae_and_expected):
+            actual_value = self.interpreter.execute(formula)
+            assert actual_value == expected, f"test #{idx} failed"
+
+    def test_chained_element_assignment(self):
+        code = """
+            a := [0, [1, 2]]
+            i := 0
+            old := a[1][i := i + 1] =: 5
+            b := c[0] := a[1][i] := 7
+            [a, old, i]
+        """
+        expected = [[0, [1, 7]], 2, 1]
+
+        actual_value = self.interpreter.execute("c := [0]; " + code)
+        assert actual_value == expected
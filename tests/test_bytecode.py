@@ -0,0 +1,108 @@
+import pytest
+
+from src.bytecode import compile_program, EVAL_NODE
+from src.exceptions import (
+    DINameError, DIZeroDivisionError, DITypeError, DIIndexError, DIRuntimeSyntaxError
+)
+from src.interpreter import MiniInterpreter
+from src.lexer import Lexer
+from src.parser import Parser
+
+
+class TestBytecode:
+
+    interpreter = MiniInterpreter()
+    vm_interpreter = MiniInterpreter(use_bytecode=True)
+
+    def test_same_results_as_tree_walker(self):
+        codes = [
+            "2 + 3 * 4 - 7 // 2",
+            "a := 5; b := a * 2; [a, b, a < b, not a, -b, #[1, 2]]",
+            "x := 0; [x =: 3, x]",
+            "if (0) 1 elif (2 > 3) 2 else 3",
+            "if (1 == 2) 1",
+            "a := 0; [a or 5, 1 and 0, 1 and 2 and 3, a ? 1]",
+            """
+            s := 0; i := 0;
+            while (i < 100) {
+                if (i % 3 == 0 and i > 5) s := s + i * 2 else s := s - 1;
+                i := i + 1;
+            }
+            s
+            """,
+            """
+            f := function(n) if (n < 2) n else f(n - 1) + f(n - 2);
+            values := [];
+            i := 0;
+            while (i < 10) {
+                values := [...values, f(i)];
+                i := i + 1;
+            }
+            values
+            """,
+            """
+            add := function(a) (function(b) a + b);
+            m := [[1, 2], [3, add(1)(2)]];
+            [m[1][1], m[0, 1], add(m[1][0])(m[0][0]), (function() 7)()]
+            """,
+        ]
+        for idx, code in enumerate(codes):
+            expected = self.interpreter.execute(code)
+            assert self.vm_interpreter.execute(code) == expected, f"test #{idx} failed"
+
+    def test_unary_plus_keeps_values(self):
+        assert self.vm_interpreter.execute("a := \"a\"; +a") == "a"
+        assert self.vm_interpreter.execute("+true") is True
+
+    def test_scope_variables_are_flushed(self):
+        code = """
+        i := 0;
+        while (i < 3) {
+            step := i;
+            i := i + 1;
+        }
+        step
+        """
+        with pytest.raises(DINameError):
+            self.vm_interpreter.execute(code)
+
+    def test_unknown_nodes_fall_back_to_tree_walker(self):
+        tree = Parser(Lexer("f := function(x) x + 1; f(1)")).parse_program()
+        code = compile_program(tree)
+
+        assert EVAL_NODE in [opcode for opcode, _, _ in code]
+        assert self.vm_interpreter.execute("f := function(x) x + 1; f(1)") == 2
+
+    def test_function_bodies_are_compiled(self):
+        tree = Parser(Lexer("f := function(n) { s := 0; while (n) { s := s + n; n := n - 1 }; s }")).parse_program()
+        compile_program(tree)
+        function = tree.instructions[0].chain_of_assignments[1]
+
+        assert function.evaluate({})([4]) == 10
+        assert function._run_body != function.body.evaluate
+
+    def test_errors(self):
+        with pytest.raises(DIZeroDivisionError):
+            self.vm_interpreter.execute("a := 0; 1 / a")
+
+        with pytest.raises(DINameError):
+            self.vm_interpreter.execute("f := function(a) a + b; f(1)")
+
+        with pytest.raises(DITypeError):
+            self.vm_interpreter.execute("f := 1; f(1)")
+
+        # the callee is checked before the arguments run
+        for interpreter in (MiniInterpreter(), MiniInterpreter(use_bytecode=True)):
+            interpreter.import_module("c := [0]; h := function() { c[0] := 1; 1 }; g := 5")
+            with pytest.raises(DITypeError):
+                interpreter.execute("g(h())")
+            assert interpreter.execute("c") == [0]
+
+        with pytest.raises(DIIndexError):
+            self.vm_interpreter.execute("a := [1, 2]; a[2]")
+
+        # errors raised while computing the value of an assignment are translated
+        with pytest.raises(DIRuntimeSyntaxError):
+            self.vm_interpreter.execute("x := [1] ^ [1, 2]")
+        with pytest.raises(DIRuntimeSyntaxError):
+            self.vm_interpreter.execute("x := 0; x =: [1] ^ [1, 2]")
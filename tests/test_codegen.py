@@ -0,0 +1,76 @@
+import pytest
+
+from src.ast import IdentifierAssignmentNode
+from src.codegen import compile_function
+from src.exceptions import DINameError, DIZeroDivisionError, DIFunctionArgsCountError
+from src.interpreter import MiniInterpreter
+from src.lexer import Lexer
+from src.parser import Parser
+
+
+def declared_function(code: str):
+    assignment = Parser(Lexer(code)).parse_program().instructions[0]
+    assert isinstance(assignment, IdentifierAssignmentNode)
+    return assignment.chain_of_assignments[1]
+
+
+class TestCodegen:
+
+    interpreter = MiniInterpreter()
+
+    def test_arithmetic_functions_are_compiled(self):
+        supported = [
+            "f := function(n) { s := 0; while (n > 0) { s := s + n; n := n - 1 }; s }",
+            "f := function(a, b) if (a < b < 10 and not (a == 0)) a ** b ** 2 elif (b) -a else a - b",
+            "f := function(x) x * scale + offset",
+            "f := function(x) +x",
+        ]
+        for idx, code in enumerate(supported):
+            assert compile_function(declared_function(code)) is not None, f"test #{idx} failed"
+
+    def test_other_functions_are_not_compiled(self):
+        unsupported = [
+            "f := function(n) f(n - 1)",
+            "f := function(a) a[0]",
+            "f := function(a) [a, a]",
+            "f := function(a) a.b",
+            "f := function(a) \"a\"",
+            "f := function(a, b) a ? b",
+            "f := function(n) { if (n) { t := 1 }; t }",
+        ]
+        for idx, code in enumerate(unsupported):
+            assert compile_function(declared_function(code)) is None, f"test #{idx} failed"
+
+    def test_same_results_as_tree_walker(self):
+        code = """
+        scale := 3
+        f := function(n, k) {
+            s := 0;
+            i := 0;
+            while ((i := i + 1) <= n) {
+                if (i % k == 0 or i > n - 2) s := s + i * scale
+                elif (i % 2) s := s - 1
+                else { t := i // 2; s := s + t ** 2 }
+            }
+            s * 1000 + i
+        }
+        [f(100, 3), f(7, 2), f(0, 1)]
+        """
+        assert self.interpreter.execute(code) == [32277101, 54008, 1]
+        assert self.interpreter.execute("f := function(x) +x; f(1 == 1)") is True
+        # the elif condition is skipped when the first branch is taken
+        code = "x := 7; f := function(n) { if (n) 1 elif ((x := 2) > 0) 3; x }; [f(1), f(0)]"
+        assert self.interpreter.execute(code) == [7, 2]
+
+    def test_errors_are_raised_by_interpreter(self):
+        with pytest.raises(DIZeroDivisionError):
+            self.interpreter.execute("f := function(a, b) a / b; f(1, 0)")
+
+        with pytest.raises(DINameError):
+            self.interpreter.execute("f := function(a) a + undefined_name; f(1)")
+
+        with pytest.raises(DINameError):
+            self.interpreter.execute("f := function(n) { if (n) 1 elif ((y := 2) > 0) 3; y }; f(1)")
+
+        with pytest.raises(DIFunctionArgsCountError):
+            self.interpreter.execute("f := function(a, b) a + b; f(1)")
@@ -54,3 +54,61 @@ class TestFunctions:
         actual_value = self.interpreter.execute(code)
         assert actual_value == expected
 
+
+    def test_closures(self):
+        code = """
+        unused := [1, 2, 3]
+        scale := function(x) x * factor + offset(x)
+        make_adder := function(n) function(x) x + n + factor
+        offset := function(x) x - 1
+        factor := 10
+        
+        add_2 := make_adder(2)
+        [scale(3), add_2(5), factor := scale(1), add_2(5)]
+        """
+        expected = [32, 17, 10, 17]
+
+        actual_value = self.interpreter.execute(code)
+        assert actual_value == expected
+
+    def test_memoized_recursion(self):
+        code = """
+        fibonacci := function(n) if (n < 2) n else fibonacci(n - 2) + fibonacci(n - 1)
+        
+        fibonacci(90); 
+        """
+        expected = 2880067194370816120
+
+        actual_value = self.interpreter.execute(code)
+        assert actual_value == expected
+
+    def test_memoized_calls_see_changes(self):
+        code = """
+        k := 1
+        f := function(n) if (n) f(n - 1) + k else 0
+        a := f(3)
+        k := 10
+        h := f
+        f := (function(n) n)
+        [a, h(3), h(1 == 1)]
+        """
+        expected = [3, 12, 10]
+
+        actual_value = self.interpreter.execute(code)
+        assert actual_value == expected
+
+    def test_memoized_calls_see_types_of_captured_values(self):
+        code = """
+        f := function(n) if (n) f(n - 1) else k
+        k := 1
+        a := f(1)
+        k := 1.0
+        b := f(1)
+        k := true
+        [a, b, f(1)]
+        """
+        expected = [1, 1.0, True]
+
+        actual_value = self.interpreter.execute(code)
+        assert actual_value == expected
+        assert [type(value) for value in actual_value] == [int, float, bool]
@@ -1,5 +1,6 @@
 import pytest
 
+from src.exceptions import DINameError, DIZeroDivisionError
 from src.interpreter import MiniInterpreter
 
 
@@ -31,3 +32,50 @@ class TestLoops:
         actual_value_2 = self.interpreter.execute(code_2)
 
         assert actual_value_1 == actual_value_2 == expected
+
+    def test_loop_scope_variables_are_flushed(self):
+        code = """
+        total := 0;
+        i := 0;
+        while (i < 3) {
+            step := i * 2;
+            total := total + step;
+            i := i + 1;
+        }
+        """
+
+        assert self.interpreter.execute(code + "total") == 6
+
+        with pytest.raises(DINameError):
+            self.interpreter.execute(code + "step")
+
+    def test_counted_loop(self):
+        formulae_and_expected = [
+            ("s := 0; i := 0; while (i < 10) { s := s + i; i := i + 1 }; [s, i]", [45, 10]),
+            ("s := 0; i := 1; while (i <= 10) { s := s + i; i := i + 3 }; [s, i]", [22, 13]),
+            ("i := 5; r := (while (i < 3) i := i + 1); [r, i]", [None, 5]),
+            ("i := 0; r := (while (i < 2.5) i := i + 1); [r, i]", [3, 3]),
+            ("n := 3; i := 0; while (i < n * 2) { t := i; i := i + 2 }", 6),
+            ("s := 0; i := 10; while (i > 0) { s := s + i; i := i - 1 }; [s, i]", [55, 0]),
+            ("s := 0; i := 10; while (i >= 0) { s := s + i; i := i - 4 }; [s, i]", [18, -2]),
+            ("i := 0; r := (while (i > 3) i := i - 1); [r, i]", [None, 0]),
+        ]
+        for idx, (formula, expected) in enumerate(formulae_and_expected):
+            actual_value = self.interpreter.execute(formula)
+            assert actual_value == expected, f"test #{idx} failed"
+
+    def test_scope_variables_are_flushed_on_error(self):
+        for interpreter in (MiniInterpreter(), MiniInterpreter(use_bytecode=True)):
+            with pytest.raises(DIZeroDivisionError):
+                interpreter.import_module("i := 0; while (i < 3) { step := i; i := i + 1; step / 0 }")
+            assert 'i' in interpreter.environment
+            assert 'step' not in interpreter.environment
+
+    def test_cached_programs_are_run_again(self):
+        code = "s := 0; i := 0; while (i < n) { s := s + i * k; i := i + 1 }; s"
+        for interpreter in (MiniInterpreter(), MiniInterpreter(use_bytecode=True)):
+            results = []
+            for n, k in [(3, 1), (4, 2), (0, 5)]:
+                interpreter.import_module(f"n := {n}; k := {k};")
+                results.append(interpreter.execute(code))
+            assert results == [3, 12, 0]
@@ -0,0 +1,179 @@
+import pytest
+
+from src.ast import (
+    NumberNode, StringNode, BooleanNode, NullNode, LeftPolyOperatorNode, IfElseNode, ScopeNode, IdentifierNode,
+    InvariantNode, LazyConstantNode, OperatorNode
+)
+from src.exceptions import DIZeroDivisionError
+from src.interpreter import MiniInterpreter
+from src.lexer import Lexer
+from src.optimizer import fold_constants, optimize as optimize_tree
+from src.parser import Parser
+
+
+def optimize(code: str):
+    return fold_constants(Parser(Lexer(code)).parse_program())
+
+
+def optimize_all(code: str):
+    return optimize_tree(Parser(Lexer(code)).parse_program())
+
+
+def walk(node):
+    yield node
+    for child in node.children():
+        yield from walk(child)
+
+
+class TestConstantFolding:
+
+    interpreter = MiniInterpreter()
+
+    def test_literal_subtrees_are_folded(self):
+        formulae_and_expected = [
+            ("2 + 3 * 4", NumberNode, 14),
+            ("\"ab\" + \"cd\"", StringNode, "abcd"),
+            ("1 < 2 and not (3 == 4)", BooleanNode, True),
+            ("-(2 ** 3) // 3", NumberNode, -3),
+        ]
+        for idx, (formula, node_type, expected) in enumerate(formulae_and_expected):
+            tree = optimize(formula)
+            assert isinstance(tree.instructions[0], node_type), f"test #{idx} failed"
+            assert tree.evaluate({}) == expected, f"test #{idx} failed"
+
+    def test_subtrees_with_variables_are_kept(self):
+        tree = optimize("x + 2 * 3")
+        node = tree.instructions[0]
+
+        assert isinstance(node, LeftPolyOperatorNode)
+        assert isinstance(node.operands[1], NumberNode)
+        assert tree.evaluate({'x': 1}) == 7
+
+    def test_errors_are_deferred_to_runtime(self):
+        code = """
+        if (0) 1 / 0 else 2 ** 1000
+        """
+        assert self.interpreter.execute(code) == 2 ** 1000
+
+        with pytest.raises(DIZeroDivisionError):
+            self.interpreter.execute("1 / 0;")
+
+    def test_literal_operands_are_folded_partially(self):
+        formulae_and_expected = [
+            ("x or 0 or y", {'x': 0, 'y': 5}, 5),
+            ("x and 1 and y", {'x': 2, 'y': 3}, 3),
+            ("x ? null ? 4", {'x': None}, 4),
+            ("2 * 3 * x", {'x': 2}, 12),
+        ]
+        for idx, (formula, environment, expected) in enumerate(formulae_and_expected):
+            tree = optimize(formula)
+            assert len(tree.instructions[0].operands) == 2, f"test #{idx} failed"
+            assert tree.evaluate(environment) == expected, f"test #{idx} failed"
+
+        assert isinstance(optimize("0 or x").instructions[0], IdentifierNode)
+        assert len(self.interpreter.execute("\"ab\" * 5000;")) == 10000
+
+    def test_expensive_literals_are_computed_once(self):
+        tree = optimize("x := 0; while (x < 3) x := x + 2 ** 1000 // 2 ** 999; x")
+        constants = [node for node in walk(tree) if isinstance(node, LazyConstantNode)]
+
+        assert len(constants) == 2
+        assert tree.evaluate({}) == 4
+
+    def test_literal_conditions_are_pruned(self):
+        tree = optimize("x := 1; if (0) 1 elif (x) 2 elif (1 < 2) 3 elif (x) 4 else 5")
+        node = tree.instructions[1]
+
+        assert isinstance(node, IfElseNode)
+        assert len(node.conditions) == 1
+        assert tree.evaluate({}) == 2
+
+        assert isinstance(optimize("if (1) 2 else 3").instructions[0], ScopeNode)
+        assert isinstance(optimize("if (0) 2").instructions[0], NullNode)
+
+
+class TestLoopInvariants:
+
+    interpreter = MiniInterpreter()
+
+    def test_invariants_are_cached_per_loop_run(self):
+        code = """
+        f := function(n) {
+            total := 0;
+            i := 0;
+            while (i < 3) {
+                total := total + n * 10 + (if (n > 0) f(n - 1) else 0);
+                i := i + 1;
+            }
+            total;
+        }
+        f(2)
+        """
+        assert self.interpreter.execute(code) == 150
+
+    def test_reassigned_variables_are_not_cached(self):
+        code = """
+        a := 1;
+        i := 0;
+        while (i < 4) {
+            a := a * 2 + (i := i + 1) * 0;
+        }
+        a
+        """
+        assert self.interpreter.execute(code) == 16
+
+    def test_values_changed_in_place_are_not_cached(self):
+        codes_and_expected = [
+            ("P := class (v) {}; [p, x] := [P(0), P(0)]; q := p; i := 0; r := [];"
+             "while (i < 2) { r := [...r, p == x]; q.v := 1; i := i + 1 }; r", [True, False]),
+            ("P := class (v) {}; [p, x] := [P(0), P(0)]; g := function(o) o.v := 1; i := 0; r := [];"
+             "while (i < 2) { r := [...r, p == x]; g(p); i := i + 1 }; r", [True, False]),
+            ("a := [0]; b := [0]; c := a; i := 0; r := [];"
+             "while (i < 2) { r := [...r, a == b]; c[0] := 1; i := i + 1 }; r", [True, False]),
+            ("a := [0]; b := [0]; c := a; n := 0; i := 0; while (i < 2 + (a == b)) { c[0] := 1; i := i + 1; n := n + 1 }; n", 2),
+        ]
+        for idx, (code, expected) in enumerate(codes_and_expected):
+            assert self.interpreter.execute(code) == expected, f"test #{idx} failed"
+
+    def test_pure_calls_are_cached(self):
+        code = """
+        k := 3;
+        square := function(x) x * x + k;
+        twice := function(x) 2 * square(x);
+        s := 0;
+        i := 0;
+        while (i < 4) {
+            s := s + twice(k + 1) + square(i);
+            i := i + 1;
+        }
+        s
+        """
+        tree = optimize_all(code)
+        loop = tree.instructions[-2]
+        invariants = [node for node in walk(loop) if isinstance(node, InvariantNode)]
+
+        assert [type(node.expression) for node in invariants] == [OperatorNode]
+        assert tree.evaluate({}) == 4 * 38 + (3 + 4 + 7 + 12)
+
+    def test_pure_calls_reading_changed_values_are_not_cached(self):
+        codes_and_expected = [
+            ("P := class (v) {}; [p, x] := [P(0), P(0)]; same := function(o) o == x; q := x; i := 0; r := [];"
+             "while (i < 2) { r := [...r, same(p)]; q.v := 1; i := i + 1 }; r", [True, False]),
+            ("P := class (v) {}; [p, x] := [P(0), P(0)]; same := function() p == x; q := p; i := 0; r := [];"
+             "while (i < 2) { r := [...r, same()]; q.v := 1; i := i + 1 }; r", [True, False]),
+            ("a := [0]; b := [0]; same := function() a == b; c := a; n := 0; i := 0;"
+             "while (i < 2 + same()) { c[0] := 1; i := i + 1; n := n + 1 }; n", 2),
+        ]
+        for idx, (code, expected) in enumerate(codes_and_expected):
+            assert self.interpreter.execute(code) == expected, f"test #{idx} failed"
+
+    def test_impure_calls_are_not_cached(self):
+        codes = [
+            "f := function(x) x * k; k := 1; s := 0; while (k < 4) { s := s + f(1); k := k + 1 }; s",
+            "f := function(x) x; f := function(x) a[0]; a := [1]; s := 0; while ((s := s + f(0)) < 5) a[0] := 2; s",
+            "f := function(x) #x; s := 0; while (s < 4) s := s + f([1]); s",
+        ]
+        for idx, code in enumerate(codes):
+            tree = optimize_all(code)
+            assert not any(isinstance(node, InvariantNode) and isinstance(node.expression, OperatorNode)
+                           for node in walk(tree)), f"test #{idx} failed"